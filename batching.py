@@ -0,0 +1,124 @@
+import json
+import threading
+from web3.providers import JSONBaseProvider
+import config
+
+# -------------------- Склейка JSON-RPC запросов --------------------
+# Независимые чтения, которые разные кошельки делают одновременно
+# (nonce на старте, gas_price, eth_call, квитанции), копятся BATCH_WINDOW
+# секунд и уходят одним батчем. Одинаковые запросы в полёте не дублируются:
+# все ожидающие получают один и тот же ответ.
+BATCH_WINDOW = getattr(config, "BATCH_WINDOW", 0.01)
+BATCH_MAX = getattr(config, "BATCH_MAX", 100)
+COALESCE_METHODS = {
+    "eth_blockNumber",
+    "eth_call",
+    "eth_chainId",
+    "eth_estimateGas",
+    "eth_feeHistory",
+    "eth_gasPrice",
+    "eth_getBalance",
+    "eth_getLogs",
+    "eth_getTransactionByHash",
+    "eth_getTransactionCount",
+    "eth_getTransactionReceipt",
+}
+
+
+class _Call:
+    __slots__ = ("key", "method", "params", "done", "response", "error")
+
+    def __init__(self, key, method, params):
+        self.key = key
+        self.method = method
+        self.params = params
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class CoalescingProvider(JSONBaseProvider):
+    def __init__(self, inner, window=BATCH_WINDOW, max_batch=BATCH_MAX, **kwargs):
+        super().__init__(**kwargs)
+        self.inner = inner
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = {"calls": 0, "deduplicated": 0, "batches": 0, "batched_calls": 0}
+        self._lock = threading.Lock()
+        self._queue = []
+        self._inflight = {}
+        self._timer = None
+
+    def __str__(self):
+        return f"Coalescing {self.inner}"
+
+    def make_request(self, method, params):
+        if method not in COALESCE_METHODS:
+            return self.inner.make_request(method, params)
+
+        key = (method, json.dumps(params, sort_keys=True, default=str))
+        batch = None
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._inflight.get(key)
+            if call is not None:
+                self.stats["deduplicated"] += 1
+            else:
+                call = _Call(key, method, params)
+                self._inflight[key] = call
+                self._queue.append(call)
+                if len(self._queue) >= self.max_batch:
+                    batch = self._take()
+                elif self._timer is None:
+                    self._timer = threading.Timer(self.window, self._flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            self._send(batch)
+
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.response
+
+    def _take(self):
+        batch, self._queue = self._queue, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch):
+        try:
+            if len(batch) == 1:
+                responses = [self.inner.make_request(batch[0].method, batch[0].params)]
+            else:
+                responses = self.inner.make_batch_request([(c.method, c.params) for c in batch])
+                if not isinstance(responses, list):
+                    # Ошибка всего батча приходит одним объектом
+                    responses = [responses] * len(batch)
+            for call, response in zip(batch, responses):
+                call.response = response
+        except Exception as e:
+            for call in batch:
+                call.error = e
+        finally:
+            with self._lock:
+                self.stats["batches"] += 1
+                self.stats["batched_calls"] += len(batch)
+                for call in batch:
+                    self._inflight.pop(call.key, None)
+            for call in batch:
+                call.done.set()
+
+    def make_batch_request(self, batch_requests):
+        return self.inner.make_batch_request(batch_requests)
+
+    def is_connected(self, show_traceback=False):
+        return self.inner.is_connected(show_traceback)
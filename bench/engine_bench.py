@@ -0,0 +1,78 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web3 import Web3
+import comfy
+import engine
+import gas
+import registry
+from nonces import get_nonce
+
+# -------------------- Настройки --------------------
+# Сравнение: один RPC-вызов за раз против пула на все кошельки.
+# Нужен anvil (foundry) в PATH.
+ANVIL_PORT = 8546
+BLOCK_TIME = 2
+WALLETS = 20
+
+
+def start_anvil():
+    proc = subprocess.Popen(
+        ["anvil", "--port", str(ANVIL_PORT), "--block-time", str(BLOCK_TIME), "--chain-id", str(comfy.CHAIN_ID)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    w3 = Web3(Web3.HTTPProvider(f"http://127.0.0.1:{ANVIL_PORT}"))
+    for _ in range(50):
+        if w3.is_connected():
+            return proc, w3
+        time.sleep(0.2)
+    proc.kill()
+    raise Exception("❌ anvil did not start")
+
+
+def fund_wallets(w3, count):
+    wallets = []
+    for _ in range(count):
+        account = w3.eth.account.create()
+        w3.provider.make_request("anvil_setBalance", [account.address, hex(10 ** 20)])
+        wallets.append(account.key.hex())
+    return wallets
+
+
+async def self_transfer(w3, wallet):
+    public = registry.get(wallet).address
+    tx = {
+        "chainId": comfy.CHAIN_ID,
+        "from": public,
+        "to": public,
+        "value": 0,
+        **await gas.fees(w3),
+        "nonce": await get_nonce(w3, wallet),
+    }
+    return await comfy.send_transaction(w3, wallet, tx, "self_transfer")
+
+
+async def run_group(w3, wallets, limit):
+    engine.set_max_in_flight(limit)
+    start = time.perf_counter()
+    await asyncio.gather(*(self_transfer(w3, wallet) for wallet in wallets))
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    proc, w3 = start_anvil()
+    try:
+        results = {}
+        for limit in (1, WALLETS):
+            wallets = fund_wallets(w3, WALLETS)
+            results[limit] = asyncio.run(run_group(w3, wallets, limit))
+        for limit, elapsed in results.items():
+            print(f"MAX_IN_FLIGHT={limit:<4} {WALLETS} wallets: {elapsed:.2f}s")
+        print(f"Speedup: x{results[1] / results[WALLETS]:.1f}")
+    finally:
+        proc.terminate()
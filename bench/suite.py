@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eth_utils import keccak
+from web3 import Web3
+import comfy
+import gas
+import hangman
+import main
+import metrics
+import preflight
+import registry
+import transport
+
+# -------------------- Настройки --------------------
+# Полный прогон main.run_group против локального anvil: по реальным адресам
+# USDC, cUSDC и фабрики Hangman через anvil_setCode ставятся заглушки с теми же
+# селекторами, все задержки обнулены. Результат — JSON с пропускной способностью,
+# числом RPC-вызовов и p50/p99 по операциям. Нужен anvil (foundry) в PATH; без
+# него поднимается bench/tester_node.py на eth-tester (медленнее, блок на каждую tx).
+# Пропускная способность считается только по успешным раундам и транзакциям,
+# упавшие раунды и откаты идут отдельными полями.
+ANVIL_PORT = 8547
+BLOCK_TIME = 1
+WALLET_COUNTS = (10, 100, 1000)
+MODES = ("hangman", "comfy", "mixed")
+ROUNDS = 2
+OUTPUT = "bench/results.json"
+
+# Заглушка токена и обёртки: любой вызов (mint, approve, wrap, unwrap, guess)
+# успешен и возвращает true
+RETURN_TRUE = bytes.fromhex("600160005260206000f3")
+# Игра у всех игроков одна, ей хватает той же заглушки
+GAME_ADDRESS = "0x000000000000000000000000000000000000Ba5e"
+
+
+def factory_code():
+    # createGame(address) / getGameAddressByPlayer(address):
+    # LOG2(GameCreated, player) с адресом игры в data и он же в ответе
+    return (
+        bytes.fromhex("73") + bytes.fromhex(GAME_ADDRESS[2:])   # PUSH20 game
+        + bytes.fromhex("600052")                              # PUSH1 0 MSTORE
+        + bytes.fromhex("600435")                              # PUSH1 4 CALLDATALOAD (player)
+        + bytes.fromhex("7f") + keccak(text="GameCreated(address,address)")
+        + bytes.fromhex("60206000a2")                          # PUSH1 32 PUSH1 0 LOG2
+        + bytes.fromhex("60206000f3")                          # PUSH1 32 PUSH1 0 RETURN
+    )
+
+
+def start_node(node, block_time=BLOCK_TIME):
+    if node == "anvil":
+        command = ["anvil", "--port", str(ANVIL_PORT), "--block-time", str(block_time),
+                   "--chain-id", str(comfy.CHAIN_ID), "--gas-limit", "300000000"]
+    else:
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "tester_node.py"),
+                   "--port", str(ANVIL_PORT), "--chain-id", str(comfy.CHAIN_ID)]
+    proc = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    w3 = Web3(Web3.HTTPProvider(f"http://127.0.0.1:{ANVIL_PORT}"))
+    for _ in range(100):
+        if w3.is_connected():
+            return proc, w3
+        time.sleep(0.2)
+    proc.kill()
+    raise Exception(f"❌ {node} did not start")
+
+
+def install_stubs(w3):
+    for address, code in (
+        (comfy.USDC_CONTRACT, RETURN_TRUE),
+        (comfy.WRAP_CONTRACT, RETURN_TRUE),
+        (GAME_ADDRESS, RETURN_TRUE),
+        (hangman.HANGMAN_FACTORY_ADDRESS, factory_code()),
+    ):
+        w3.provider.make_request("anvil_setCode", [address, "0x" + code.hex()])
+
+
+def fund_wallets(w3, count):
+    wallets = []
+    for _ in range(count):
+        account = w3.eth.account.create()
+        w3.provider.make_request("anvil_setBalance", [account.address, hex(10 ** 20)])
+        wallets.append(account.key.hex())
+    return wallets
+
+
+def zero_delays(wallets):
+    for record in registry.register(wallets):
+        record.delay = 0.0
+        record.tx_delay = 0.0
+
+
+def collect(summary, mode, count):
+    ops = {}
+    for labels, n, avg, p50, p99, top in metrics.collector.histogram_rows("op_seconds"):
+        ops.setdefault(labels["op"], {})[labels["status"]] = {"count": n, "avg": avg, "p50": p50, "p99": p99, "max": top}
+    stages = {
+        labels["stage"]: {"count": n, "avg": avg, "p50": p50, "p99": p99, "max": top}
+        for labels, n, avg, p50, p99, top in metrics.collector.histogram_rows("tx_stage_seconds")
+    }
+    rpc = {labels["method"]: value for labels, value in metrics.collector.counter_rows("rpc_calls_total")}
+    requests = sum(n for _, n, *_ in metrics.collector.histogram_rows("rpc_request_seconds"))
+    txs = {labels["status"]: value for labels, value in metrics.collector.counter_rows("tx_total")}
+    dropped = sum(value for _, value in metrics.collector.counter_rows("tx_dropped_total"))
+    if dropped:
+        txs["dropped"] = dropped
+    mined = txs.get("mined", 0)
+    return {
+        "mode": mode,
+        "wallets": count,
+        "rounds": summary["rounds_done"] + summary["rounds_failed"],
+        "rounds_done": summary["rounds_done"],
+        "rounds_failed": summary["rounds_failed"],
+        "transactions": mined,
+        "transactions_by_status": txs,
+        "elapsed": summary["elapsed"],
+        "rounds_per_second": summary["rounds_done"] / summary["elapsed"],
+        "tx_per_second": mined / summary["elapsed"],
+        "rpc_calls": sum(rpc.values()),
+        "rpc_http_requests": requests,
+        "rpc_calls_by_method": rpc,
+        "operations": ops,
+        "stages": stages,
+    }
+
+
+def run_case(w3, mode, count, rounds, workdir):
+    # Каждому прогону — чистые метрики и профили газа
+    metrics.collector = metrics.Metrics()
+    gas.profiles = gas.GasProfiles(os.path.join(workdir, f"gas_{mode}_{count}.json"))
+    hangman.LETTER_DELAY = (0, 0)
+    comfy.DELAY_RANGE = (0, 0)
+    main.MODE = mode
+    # В чистом anvil нет Multicall3, а заглушки не хранят балансы
+    preflight.PREFLIGHT = False
+    main.ROUNDS_PER_WALLET = rounds
+
+    wallets = fund_wallets(w3, count)
+    zero_delays(wallets)
+    summary = asyncio.run(main.run_group(wallets, 0, None, None, None))
+    return collect(summary, mode, count)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark comfy/hangman/mixed modes against a local anvil")
+    parser.add_argument("--wallets", default=",".join(map(str, WALLET_COUNTS)), help="comma-separated wallet counts")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated modes")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help="rounds per wallet")
+    parser.add_argument("--block-time", type=int, default=BLOCK_TIME, help="anvil block time, s")
+    parser.add_argument("--node", choices=("anvil", "tester"), default="anvil" if shutil.which("anvil") else "tester",
+                        help="local chain: anvil or eth-tester (bench/tester_node.py)")
+    parser.add_argument("--output", default=OUTPUT, help="where to write JSON results")
+    args = parser.parse_args()
+
+    transport.RPC_URLS = [f"http://127.0.0.1:{ANVIL_PORT}"]
+    proc, w3 = start_node(args.node, args.block_time)
+    results = []
+    try:
+        install_stubs(w3)
+        with tempfile.TemporaryDirectory() as workdir:
+            for mode in args.modes.split(","):
+                for count in map(int, args.wallets.split(",")):
+                    result = run_case(w3, mode, count, args.rounds, workdir)
+                    results.append(result)
+                    print(
+                        f"{mode:<8} {count:>5} wallets: {result['rounds_done']}/{result['rounds']} rounds ok, "
+                        f"{result['rounds_failed']} failed in {result['elapsed']:.1f}s | "
+                        f"{result['tx_per_second']:.1f} tx/s | txs {result['transactions_by_status']} | "
+                        f"{result['rpc_calls']} RPC calls in {result['rpc_http_requests']} HTTP requests"
+                    )
+    finally:
+        proc.terminate()
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "node": args.node,
+            "block_time": args.block_time,
+            "rounds_per_wallet": args.rounds,
+            "results": results,
+        }, f, indent=2)
+    print(f"📄 Results written to {args.output}")
@@ -0,0 +1,116 @@
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from eth_tester import EthereumTester, PyEVMBackend
+from eth_utils import to_canonical_address
+from web3 import EthereumTesterProvider
+from web3.providers.eth_tester.middleware import request_formatters, result_formatters
+
+# -------------------- Локальная нода на eth-tester --------------------
+# Замена anvil, когда foundry под рукой нет: py-evm за HTTP JSON-RPC
+# плюс anvil_setCode / anvil_setBalance, которыми пользуется bench/suite.py.
+# Каждая транзакция сразу попадает в свой блок. Запросы выполняются по
+# одному под блокировкой: eth-tester не потокобезопасен.
+# Нужен пакет eth-tester[py-evm].
+PORT = 8547
+ZERO_ADDRESS = "0x" + "00" * 20
+
+
+def to_rpc(value):
+    # eth-tester отдаёт числа и байты как есть, по проводу нужны hex-строки
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, dict):
+        return {k: to_rpc(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_rpc(v) for v in value]
+    return value
+
+
+class TesterNode:
+    def __init__(self, chain_id):
+        self.backend = PyEVMBackend()
+        self.backend.chain.chain_id = chain_id
+        self.tester = EthereumTester(self.backend)
+        self.provider = EthereumTesterProvider(self.tester)
+        self.chain_id = chain_id
+        self._lock = threading.Lock()
+
+    def _set_state(self, address, balance=None, code=None):
+        # Меняем состояние ожидающего блока и сразу его закрываем
+        chain = self.backend.chain
+        state = chain.get_vm().state
+        address = to_canonical_address(address)
+        if balance is not None:
+            state.set_balance(address, balance)
+        if code is not None:
+            state.set_code(address, code)
+        state.persist()
+        chain.header = chain.header.copy(state_root=state.state_root)
+        self.tester.mine_blocks(1)
+        return True
+
+    def _call(self, method, params):
+        if method == "eth_chainId":
+            return {"result": self.chain_id}
+        if method == "anvil_setBalance":
+            return {"result": self._set_state(params[0], balance=int(params[1], 16))}
+        if method == "anvil_setCode":
+            return {"result": self._set_state(params[0], code=bytes.fromhex(params[1][2:]))}
+        if method in ("eth_call", "eth_estimateGas") and "from" not in params[0]:
+            params = [{**params[0], "from": ZERO_ADDRESS}] + list(params[1:])
+        # Те же преобразования, что делает middleware web3 для EthereumTesterProvider
+        if method in request_formatters:
+            params = request_formatters[method](params)
+        response = self.provider.make_request(method, params)
+        if "result" in response and method in result_formatters:
+            response["result"] = result_formatters[method](response["result"])
+        return response
+
+    def handle(self, request):
+        with self._lock:
+            try:
+                response = self._call(request["method"], request.get("params", []))
+            except Exception as e:
+                response = {"error": {"code": -32000, "message": f"{type(e).__name__}: {e}"}}
+        # id — всегда из запроса: EthereumTesterProvider ставит свой счётчик
+        response = {**response, "jsonrpc": "2.0", "id": request.get("id")}
+        if "result" in response:
+            response["result"] = to_rpc(response["result"])
+        return response
+
+
+def serve(port, chain_id):
+    node = TesterNode(chain_id)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if isinstance(request, list):
+                response = [node.handle(r) for r in request]
+            else:
+                response = node.handle(request)
+            body = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON-RPC node on eth-tester with anvil_setCode/anvil_setBalance")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--chain-id", type=int, required=True)
+    args = parser.parse_args()
+    serve(args.port, args.chain_id)
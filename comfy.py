@@ -1,9 +1,14 @@
 import asyncio
 import random
-from web3 import Web3
-from colorama import Fore, Style, init
-
-init(autoreset=True)
+import config
+from functools import lru_cache
+import gas
+import logs
+import registry
+import scheduler
+import sender
+import signer
+from nonces import get_nonce, release_nonces
 
 # -------------------- Настройки --------------------
 DELAY_RANGE = (15, 25)
@@ -12,74 +17,49 @@ USDC_CONTRACT = '0xAF33ADd7918F685B2A82C1077bd8c07d220FFA04'
 CHAIN_ID = 84532
 RPC_URL = "https://sepolia.base.org"
 ROUNDS_PER_WALLET = 2  # количество функций за один "раунд" кошелька
-
-COLOR_LIST = [Fore.RED, Fore.GREEN, Fore.YELLOW, Fore.CYAN, Fore.MAGENTA]
-wallet_colors = {}
-wallet_delays = {}
-wallet_nonces = {}
+APPROVE_MAX = getattr(config, "APPROVE_MAX", False)  # один approve на максимум вместо approve на каждую сумму
 
 # -------------------- Цвета --------------------
 def assign_colors(wallets):
-    for i, wallet in enumerate(wallets):
-        public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-        wallet_colors[public] = COLOR_LIST[i % len(COLOR_LIST)]
-        wallet_delays[public] = random.uniform(DELAY_RANGE[0], DELAY_RANGE[1])
-
-def colorize_for_wallet(text, public):
-    color = wallet_colors.get(public, Fore.CYAN)
-    return f"{color}{text}{Style.RESET_ALL}"
-
-# -------------------- RPC с прокси --------------------
-def connect_to_rpc_with_proxy(proxy=None):
-    if proxy:
-        import os
-        os.environ["HTTP_PROXY"] = proxy
-        os.environ["HTTPS_PROXY"] = proxy
-    w3 = Web3(Web3.HTTPProvider(RPC_URL))
-    if not w3.is_connected():
-        raise Exception(f"❌ Could not connect to RPC: {RPC_URL}")
-    print(f"{Fore.MAGENTA}✅ Connected to RPC: {RPC_URL}{Style.RESET_ALL}")
-    return w3
-
-# -------------------- Nonce --------------------
-def get_nonce(w3, wallet):
-    if wallet not in wallet_nonces:
-        public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-        wallet_nonces[wallet] = w3.eth.get_transaction_count(public)
-    nonce = wallet_nonces[wallet]
-    wallet_nonces[wallet] += 1
-    return nonce
+    for record in registry.register(wallets):
+        record.tx_delay = random.uniform(DELAY_RANGE[0], DELAY_RANGE[1])
 
 # -------------------- Рандомная задержка --------------------
 async def delay(wallet=None):
     if wallet:
-        public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-        t = wallet_delays.get(public, random.uniform(DELAY_RANGE[0], DELAY_RANGE[1]))
-        print(colorize_for_wallet(f"⏱ Waiting {t:.1f}s before next tx", public))
+        record = registry.get(wallet)
+        if record.tx_delay is None:
+            record.tx_delay = random.uniform(DELAY_RANGE[0], DELAY_RANGE[1])
+        t = record.tx_delay
+        logs.log(f"⏱ Waiting {t:.1f}s before next tx", wallet=record.address, sample="waiting")
     else:
         t = random.uniform(DELAY_RANGE[0], DELAY_RANGE[1])
-    await asyncio.sleep(t)
+    await scheduler.sleep(t)
 
 # -------------------- Отправка транзакции --------------------
-async def send_transaction(w3, wallet, tx, description="tx"):
-    public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-    for attempt in range(3):
+async def send_transaction(w3, wallet, tx, description="tx", signed=None):
+    record = registry.get(wallet)
+    public = record.address
+    # У заранее подписанной транзакции лимит газа уже выставлен
+    for attempt in range(0 if signed else 3):
         try:
-            gas_estimate = w3.eth.estimate_gas(tx)
-            tx['gas'] = int(gas_estimate * 1.2)
+            tx['gas'] = await gas.gas_limit(w3, tx)
             break
         except Exception as e:
             if attempt == 2:
+                # До отправки не дошло: nonce, выданный при сборке tx, возвращаем
+                release_nonces(wallet, tx["nonce"], tx["nonce"] + 1)
                 raise
-            print(colorize_for_wallet(f'⚠️ Gas estimation failed, retry {attempt + 1}: {e}', public))
+            logs.log(f'⚠️ Gas estimation failed, retry {attempt + 1}: {e}', wallet=public)
 
-    signed_tx = w3.eth.account.sign_transaction(tx, wallet)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    tx_hash = await sender.broadcast(w3, wallet, tx, signed)
+    receipt = await sender.confirm(w3, wallet, tx, tx_hash)
+    gas.observe(tx, receipt)
     if receipt["status"] != 1:
         raise Exception(f"[{tx['from']}] {description} transaction failed")
-    print(colorize_for_wallet(f"[{tx['from']}] {description} DONE | {tx_hash.hex()}", public))
-    return tx_hash.hex()
+    mined_hash = receipt["transactionHash"].hex()  # после замены по комиссии хэш может отличаться
+    logs.log(f"[{tx['from']}] {description} DONE | {mined_hash}", wallet=public)
+    return mined_hash
 
 # -------------------- Случайные суммы для каждой функции --------------------
 def random_amount_for_function(func_type):
@@ -92,99 +72,201 @@ def random_amount_for_function(func_type):
     else:
         return random.randint(1000, 3000)
 
+# -------------------- Calldata --------------------
+# Постоянные части calldata кодируются один раз; сумма дописывается 32 байтами.
+MINT_SELECTOR = bytes.fromhex("40c10f19")
+APPROVE_PREFIX = bytes.fromhex("095ea7b3" + "00" * 12 + WRAP_CONTRACT.lower()[2:])
+WRAP_SELECTOR = bytes.fromhex("ea598cb0")
+UNWRAP_SELECTOR = bytes.fromhex("de0e9a3e")
+
+def token_units(amount):
+    return (amount * 10 ** 18).to_bytes(32, "big")
+
+@lru_cache(maxsize=None)
+def mint_prefix(address_hex):
+    return MINT_SELECTOR + bytes(12) + bytes.fromhex(address_hex)
+
+def build_calldata(func_type, address_hex, amount):
+    units = token_units(amount)
+    if func_type in ("mint_usdc", "mint_cusdc"):
+        return (mint_prefix(address_hex) + units,)
+    elif func_type == "shield_usdc":
+        return (APPROVE_PREFIX + units, WRAP_SELECTOR + units)
+    elif func_type == "unshield_cusdc":
+        return (UNWRAP_SELECTOR + units,)
+    raise ValueError(f"No calldata template for {func_type}")
+
+MAX_UINT256 = 2 ** 256 - 1
+APPROVE_MAX_DATA = APPROVE_PREFIX + MAX_UINT256.to_bytes(32, "big")
+
+def resolve_calldata(func_type, record, amount=None, calldata=None):
+    if calldata is None:
+        if amount is None:
+            amount = random_amount_for_function(func_type)
+        calldata = build_calldata(func_type, record.address_hex, amount)
+    return calldata
+
 # -------------------- Основные операции --------------------
-async def mint_usdc(w3, wallet):
-    public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-    amount = int(w3.to_wei(random_amount_for_function("mint_usdc"), "ether"))
+async def mint_usdc(w3, wallet, amount=None, calldata=None):
+    record = registry.get(wallet)
+    public = record.address
+    calldata = resolve_calldata("mint_usdc", record, amount, calldata)
     tx = {
         "chainId": CHAIN_ID,
-        "data": f"0x40c10f19"
-                f"000000000000000000000000{public.lower()[2:]}"
-                f"{amount:064x}",
+        "data": calldata[0],
         "from": public,
         "gas": random.randint(170000, 200000),
-        "gasPrice": w3.eth.gas_price,
-        "nonce": get_nonce(w3, wallet),
+        **await gas.fees(w3),
+        "nonce": await get_nonce(w3, wallet),
         "to": USDC_CONTRACT
     }
     return await send_transaction(w3, wallet, tx, "mint_usdc")
 
-async def mint_cusdc(w3, wallet):
-    public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-    amount = int(w3.to_wei(random_amount_for_function("mint_cusdc"), "ether"))
+async def mint_cusdc(w3, wallet, amount=None, calldata=None):
+    record = registry.get(wallet)
+    public = record.address
+    calldata = resolve_calldata("mint_cusdc", record, amount, calldata)
     tx = {
         "chainId": CHAIN_ID,
-        "data": f"0x40c10f19"
-                f"000000000000000000000000{public.lower()[2:]}"
-                f"{amount:064x}",
+        "data": calldata[0],
         "from": public,
         "gas": random.randint(170000, 200000),
-        "gasPrice": w3.eth.gas_price,
-        "nonce": get_nonce(w3, wallet),
+        **await gas.fees(w3),
+        "nonce": await get_nonce(w3, wallet),
         "to": WRAP_CONTRACT
     }
     return await send_transaction(w3, wallet, tx, "mint_cusdc")
 
-async def shield_usdc(w3, wallet):
-    public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-    amount = int(w3.to_wei(random_amount_for_function("shield_usdc"), "ether"))
+# -------------------- Разрешения для WRAP_CONTRACT --------------------
+# Текущий allowance каждого кошелька к WRAP_CONTRACT в wei: читается пачкой
+# при старте (preflight) и дальше ведётся локально после approve/wrap.
+# None — неизвестно, тогда approve отправляется как раньше.
+allowances = {}
+
+def remember_allowances(values):
+    allowances.update(values)
+
+def wrap_units(wrap_data):
+    return int.from_bytes(wrap_data[-32:], "big")
+
+async def wrap_only(w3, wallet, wrap_data):
+    record = registry.get(wallet)
+    tx_wrap = {
+        "chainId": CHAIN_ID,
+        "data": wrap_data,
+        "from": record.address,
+        "gas": random.randint(190000, 220000),
+        **await gas.fees(w3),
+        "nonce": await get_nonce(w3, wallet),
+        "to": WRAP_CONTRACT
+    }
+    return await send_transaction(w3, wallet, tx_wrap, "wrap")
+
+def spend_allowance(public, units, ok):
+    allowance = allowances.get(public)
+    if not ok:
+        allowances[public] = None  # после отката состояние неизвестно
+    elif allowance is not None and allowance != MAX_UINT256:
+        allowances[public] = max(0, allowance - units)
+
+async def shield_usdc(w3, wallet, amount=None, calldata=None):
+    record = registry.get(wallet)
+    public = record.address
+    approve_data, wrap_data = resolve_calldata("shield_usdc", record, amount, calldata)
+    units = wrap_units(wrap_data)
+    allowance = allowances.get(public)
+    if allowance is not None and allowance >= units:
+        # Разрешения хватает — approve и пауза после него не нужны
+        logs.log(f"[{public}] allowance {allowance / 10 ** 18:.0f} covers wrap, approve skipped", wallet=public)
+        try:
+            result = await wrap_only(w3, wallet, wrap_data)
+        except Exception:
+            spend_allowance(public, units, False)
+            raise
+        spend_allowance(public, units, True)
+        return result
+
+    if APPROVE_MAX:
+        approve_data = APPROVE_MAX_DATA
+    fees = await gas.fees(w3)
+    nonce = await get_nonce(w3, wallet, count=2)
     tx_approve = {
         "chainId": CHAIN_ID,
-        "data": f"0x095ea7b3"
-                f"000000000000000000000000{WRAP_CONTRACT.lower()[2:]}"
-                f"{amount:064x}",
+        "data": approve_data,
         "from": public,
         "gas": random.randint(170000, 200000),
-        "gasPrice": w3.eth.gas_price,
-        "nonce": get_nonce(w3, wallet),
+        **fees,
+        "nonce": nonce,
         "to": USDC_CONTRACT
     }
-    await send_transaction(w3, wallet, tx_approve, "approve")
-    await delay(wallet)
-
     tx_wrap = {
         "chainId": CHAIN_ID,
-        "data": f"0xea598cb0{amount:064x}",
+        "data": wrap_data,
         "from": public,
         "gas": random.randint(190000, 220000),
-        "gasPrice": w3.eth.gas_price,
-        "nonce": get_nonce(w3, wallet),
+        **fees,
+        "nonce": nonce + 1,
         "to": WRAP_CONTRACT
     }
-    return await send_transaction(w3, wallet, tx_wrap, "wrap")
+    # Пара approve + wrap подписывается одной пачкой до отправки.
+    # До approve оценка wrap может не пройти — тогда берётся случайный лимит.
+    try:
+        tx_approve["gas"] = await gas.gas_limit(w3, tx_approve)
+        tx_wrap["gas"] = await gas.gas_limit(w3, tx_wrap, default=tx_wrap["gas"])
+        signed_approve, signed_wrap = await signer.sign_batch(record.key, [tx_approve, tx_wrap])
+    except Exception:
+        # Ничего не отправлено — возвращаем оба nonce
+        release_nonces(wallet, nonce, nonce + 2)
+        raise
+    try:
+        await send_transaction(w3, wallet, tx_approve, "approve", signed_approve)
+    except Exception:
+        # Nonce approve занят отправкой или уже возвращён в broadcast; свободен только nonce wrap
+        release_nonces(wallet, nonce + 1, nonce + 2)
+        raise
+    allowances[public] = int.from_bytes(approve_data[-32:], "big")
+    await delay(wallet)
+    try:
+        result = await send_transaction(w3, wallet, tx_wrap, "wrap", signed_wrap)
+    except Exception:
+        spend_allowance(public, units, False)
+        raise
+    spend_allowance(public, units, True)
+    return result
 
-async def unshield_cusdc(w3, wallet):
-    public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-    amount = int(w3.to_wei(random_amount_for_function("unshield_cusdc"), "ether"))
+async def unshield_cusdc(w3, wallet, amount=None, calldata=None):
+    record = registry.get(wallet)
+    public = record.address
+    calldata = resolve_calldata("unshield_cusdc", record, amount, calldata)
     tx = {
         "chainId": CHAIN_ID,
-        "data": f"0xde0e9a3e{amount:064x}",
+        "data": calldata[0],
         "from": public,
         "gas": random.randint(190000, 220000),
-        "gasPrice": w3.eth.gas_price,
-        "nonce": get_nonce(w3, wallet),
+        **await gas.fees(w3),
+        "nonce": await get_nonce(w3, wallet),
         "to": WRAP_CONTRACT
     }
     return await send_transaction(w3, wallet, tx, "unshield_cusdc")
 
 # -------------------- Обработка одного кошелька --------------------
 async def process_wallet(w3, wallet):
-    public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
+    public = registry.get(wallet).address
     functions = [mint_usdc, mint_cusdc, shield_usdc, unshield_cusdc]
 
     try:
         for round_num in range(1, ROUNDS_PER_WALLET + 1):
             func = random.choice(functions)  # рандомный выбор функции
-            print(colorize_for_wallet(f"⏳ [{public}] Round {round_num}: starting {func.__name__}", public))
+            logs.log(f"⏳ [{public}] Round {round_num}: starting {func.__name__}", wallet=public)
             try:
                 await func(w3, wallet)
             except Exception as e:
-                print(colorize_for_wallet(f"❌ [{public}] Round {round_num}: {func.__name__} failed | {e}", public))
+                logs.log(f"❌ [{public}] Round {round_num}: {func.__name__} failed | {e}", wallet=public)
             
             await delay(wallet)
 
     except Exception as e:
-        print(colorize_for_wallet(f"[{public}] Wallet processing failed: {e}", public))
+        logs.log(f"[{public}] Wallet processing failed: {e}", wallet=public)
 
 # -------------------- Обработка всех кошельков --------------------
 async def process_all_wallets(w3, wallets):
@@ -194,6 +276,8 @@ async def process_all_wallets(w3, wallets):
 
 # -------------------- Запуск --------------------
 if __name__ == "__main__":
+    from transport import connect_to_rpc_with_proxy
+
     with open("wallets.txt", "r") as f:
         wallets = [line.strip() for line in f if line.strip()]
 
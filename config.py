@@ -2,3 +2,44 @@ TX_DELAY = [10, 25] #5-15 seconds delay between transaction
 ERROR_PROBABILITY = 0.6 # 60% проигрыша | 60% loss
 shuffle_wallets = True # or False
 RPC_URL = "https://sepolia.base.org"
+RPC_URLS = [RPC_URL] # можно добавить несколько RPC: запросы распределяются по задержке | RPC endpoints pool
+MAX_IN_FLIGHT = 64 # максимум одновременных RPC-вызовов | max concurrent RPC calls
+HANGMAN_PIPELINE = False # буквы отправляются без ожидания подтверждения предыдущей | pipelined guesses
+PIPELINE_WINDOW = 4 # максимум неподтверждённых букв в сети | max unconfirmed guesses in flight
+RECEIPT_TICK = 1.0 # как часто трекер проверяет новый блок, сек | receipt tracker tick, s
+RECEIPT_TIMEOUT = 180 # сколько ждать квитанцию, сек | receipt timeout, s
+DROP_AFTER = 60 # через сколько сек проверять, не выпала ли транзакция из mempool | dropped tx check age, s
+GAS_TTL = 2.0 # сколько секунд живёт закэшированная цена газа | cached gas price TTL, s
+EIP1559 = False # True = maxFeePerGas/maxPriorityFeePerGas из eth_feeHistory | EIP-1559 fee fields
+GAS_MARGIN = 1.2 # запас к сохранённой оценке газа | safety margin over profiled gas
+GAS_REESTIMATE_EVERY = 200 # переоценивать лимит газа каждые N использований | re-estimate after N uses
+GAS_PROFILES_FILE = "gas_profiles.json"
+RPC_TIMEOUT = 30 # таймаут HTTP-запроса к RPC, сек | HTTP request timeout, s
+POOL_SIZE = 64 # keep-alive соединений на пару (RPC, прокси) | keep-alive connections per (endpoint, proxy)
+CIRCUIT_THRESHOLD = 3 # ошибок подряд до отключения RPC | consecutive errors before endpoint is disabled
+CIRCUIT_COOLDOWN = 30 # на сколько секунд отключать RPC | endpoint cooldown, s
+BATCH_WINDOW = 0.01 # окно склейки одновременных RPC-чтений в один батч, сек (0 = выкл) | read coalescing window, s
+BATCH_MAX = 100 # максимум запросов в одном батче | max requests per batch
+JOURNAL_FILE = "journal.db" # журнал для возобновления после падения (None = не сохранять) | resume journal
+JOURNAL_FLUSH_INTERVAL = 1.0 # как часто сбрасывать журнал на диск, сек | journal flush interval, s
+SIGNER_MODE = "process" # где подписывать транзакции: process, thread, inline | signing pool type
+SIGNER_WORKERS = 2 # размер пула подписи | signing pool size
+PLAN_DUMP = None # путь для выгрузки плана выполнения (JSON lines), None = не выгружать | plan dump path
+SCHEDULER_CONCURRENCY = 256 # максимум одновременно выполняемых операций | max operations running at once
+SCHEDULER_RATE = 0 # максимум запусков операций в секунду (0 = без ограничения) | max operation starts per second
+METRICS_FILE = None # файл с метриками в формате Prometheus, например "metrics.prom" (None = не писать) | Prometheus text file
+METRICS_PORT = None # порт HTTP /metrics для Prometheus (None = выкл) | Prometheus endpoint port
+METRICS_HOST = "127.0.0.1" # адрес для /metrics; "0.0.0.0" — доступ извне | metrics bind address
+LOG_FILE = "mint_operations.log" # файл лога (None = только консоль) | log file
+LOG_MAX_BYTES = 10 * 1024 * 1024 # размер файла лога до ротации | rotate log after N bytes
+LOG_BACKUPS = 3 # сколько старых файлов лога хранить | rotated log files to keep
+LOG_SAMPLE_INTERVAL = 5.0 # строки "Waiting" не чаще раза в N сек (0 = все) | sample repetitive lines
+PREFLIGHT = True # читать балансы всех кошельков через Multicall3 перед планированием | bulk balance preflight
+PREFLIGHT_CHUNK = 300 # кошельков на один вызов Multicall3 | wallets per multicall
+MIN_ETH_BALANCE = 0.0002 # кошельки с меньшим балансом ETH пропускаются | skip wallets below this ETH balance
+CUSDC_PLAINTEXT_BALANCE = False # balanceOf cUSDC отдаёт сумму, а не зашифрованный handle | cUSDC balanceOf is plaintext
+APPROVE_MAX = False # True = один approve USDC на максимум, дальше shield без approve | one-time unlimited approve
+STUCK_AFTER = 45 # через сколько сек без квитанции перевыпускать транзакцию с большей комиссией | stuck tx age, s
+REPLACE_MAX = 3 # максимум замен одной транзакции | max fee-bumped replacements
+FEE_BUMP = 1.125 # во сколько раз поднимать комиссию при замене (ноды требуют ≥ +10%) | replacement fee bump
+REPLACE_FEE_CAP = 3.0 # комиссия замены не выше исходной × N | replacement fee cap vs original
@@ -0,0 +1,33 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import config
+
+# -------------------- Пул RPC-вызовов --------------------
+# Web3.HTTPProvider синхронный: любой вызов (nonce, gas_price, receipt)
+# блокирует поток. Поэтому каждый RPC-вызов уходит в ограниченный пул потоков,
+# а event loop остаётся свободным для остальных кошельков.
+MAX_IN_FLIGHT = getattr(config, "MAX_IN_FLIGHT", 64)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT, thread_name_prefix="rpc")
+    return _executor
+
+
+def set_max_in_flight(limit):
+    global MAX_IN_FLIGHT, _executor
+    MAX_IN_FLIGHT = max(1, int(limit))
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+async def call(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
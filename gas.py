@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import time
+import config
+import engine
+import metrics
+
+# -------------------- Газовый оракул --------------------
+# Одна закэшированная цена газа на все кошельки вместо eth_gasPrice на каждую
+# транзакцию. Значение живёт GAS_TTL секунд (примерно один блок), одновременные
+# промахи ждут одного и того же запроса.
+GAS_TTL = getattr(config, "GAS_TTL", 2.0)
+EIP1559 = getattr(config, "EIP1559", False)
+FEE_HISTORY_BLOCKS = 5
+PRIORITY_PERCENTILE = 50
+MIN_PRIORITY_FEE = 1_000_000  # 0.001 gwei
+
+
+class GasOracle:
+    def __init__(self, w3, ttl=GAS_TTL, eip1559=EIP1559):
+        self.w3 = w3
+        self.ttl = ttl
+        self.eip1559 = eip1559
+        self.hits = 0
+        self.misses = 0
+        self._fees = None
+        self._expires = 0.0
+        self._refresh = None
+
+    async def fees(self):
+        if self._fees is not None and time.monotonic() < self._expires:
+            self.hits += 1
+            return self._fees
+        if self._refresh is not None:
+            self.hits += 1
+            return await asyncio.shield(self._refresh)
+
+        self.misses += 1
+        self._refresh = asyncio.ensure_future(self._fetch())
+        try:
+            self._fees = await asyncio.shield(self._refresh)
+            self._expires = time.monotonic() + self.ttl
+        finally:
+            self._refresh = None
+        return self._fees
+
+    async def _fetch(self):
+        if not self.eip1559:
+            return {"gasPrice": await engine.call(lambda: self.w3.eth.gas_price)}
+        history = await engine.call(
+            self.w3.eth.fee_history, FEE_HISTORY_BLOCKS, "latest", [PRIORITY_PERCENTILE]
+        )
+        base_fee = history["baseFeePerGas"][-1]  # базовая цена следующего блока
+        rewards = sorted(r[0] for r in history.get("reward", []) if r)
+        priority = max(rewards[len(rewards) // 2] if rewards else 0, MIN_PRIORITY_FEE)
+        return {"maxFeePerGas": 2 * base_fee + priority, "maxPriorityFeePerGas": priority}
+
+    def invalidate(self):
+        self._expires = 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# -------------------- Общий оракул --------------------
+_oracles = {}
+
+
+def get_oracle(w3):
+    loop = asyncio.get_running_loop()
+    oracle = _oracles.get((w3, loop))
+    if oracle is None:
+        oracle = _oracles[(w3, loop)] = GasOracle(w3)
+    return oracle
+
+
+async def fees(w3):
+    with metrics.stage("fees"):
+        return dict(await get_oracle(w3).fees())
+
+
+# -------------------- Профили лимита газа --------------------
+# У каждой операции (mint, approve, wrap, unwrap, createGame, guess) стабильная
+# стоимость, поэтому estimate_gas делается один раз на (контракт, селектор),
+# результат хранится на диске между запусками и используется с запасом.
+# Повторная оценка — только после out-of-gas или каждые GAS_REESTIMATE_EVERY раз.
+GAS_MARGIN = getattr(config, "GAS_MARGIN", 1.2)
+GAS_REESTIMATE_EVERY = getattr(config, "GAS_REESTIMATE_EVERY", 200)
+GAS_PROFILES_FILE = getattr(config, "GAS_PROFILES_FILE", "gas_profiles.json")
+
+
+def selector(data):
+    if isinstance(data, str):
+        return data[:10].lower()
+    return "0x" + bytes(data[:4]).hex()
+
+
+class GasProfiles:
+    def __init__(self, path=GAS_PROFILES_FILE, margin=GAS_MARGIN, reestimate_every=GAS_REESTIMATE_EVERY):
+        self.path = path
+        self.margin = margin
+        self.reestimate_every = reestimate_every
+        self.hits = 0
+        self.estimates = 0
+        self._profiles = None
+        self._dirty = False  # есть несохранённые счётчики uses
+
+    @staticmethod
+    def key(contract, data):
+        return f"{contract.lower()}:{selector(data)}"
+
+    def _load(self):
+        if self._profiles is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._profiles = json.load(f)
+            except (OSError, ValueError):
+                self._profiles = {}
+        return self._profiles
+
+    def save(self):
+        # Файл общий для всех шард-процессов: профили, записанные другими, не
+        # затираем, а сам файл подменяем целиком — читатель не увидит его половину
+        profiles = self._load()
+        try:
+            with open(self.path, "r") as f:
+                for key, entry in json.load(f).items():
+                    profiles.setdefault(key, entry)
+        except (OSError, ValueError):
+            pass
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(profiles, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def flush(self):
+        # В конце запуска: счётчики uses должны дожить до следующего процесса
+        if self._dirty:
+            self.save()
+
+    def lookup(self, key):
+        entry = self._load().get(key)
+        if entry is None or entry["uses"] >= self.reestimate_every:
+            return None
+        entry["uses"] += 1
+        self._dirty = True
+        if entry["uses"] >= self.reestimate_every:
+            # Порог пройден — сохраняем сразу, чтобы переоценку увидели и другие шарды
+            self.save()
+        self.hits += 1
+        return int(entry["gas"] * self.margin)
+
+    def record(self, key, estimate):
+        profiles = self._load()
+        previous = profiles.get(key, {}).get("gas", 0)
+        profiles[key] = {"gas": max(int(estimate), previous), "uses": 1}
+        self.estimates += 1
+        self.save()
+        return int(profiles[key]["gas"] * self.margin)
+
+    def invalidate(self, key):
+        if self._load().pop(key, None) is not None:
+            self.save()
+
+    def stats(self):
+        return {"hits": self.hits, "estimates": self.estimates}
+
+
+profiles = GasProfiles()
+
+
+async def gas_limit(w3, tx, contract=None, default=None):
+    key = GasProfiles.key(contract or tx["to"], tx.get("data", b""))
+    limit = profiles.lookup(key)
+    if limit is not None:
+        metrics.inc("gas_limit_total", source="profile")
+        return limit
+    try:
+        with metrics.stage("estimate_gas"):
+            estimate = await engine.call(w3.eth.estimate_gas, tx)
+    except Exception:
+        if default is None:
+            raise
+        metrics.inc("gas_limit_total", source="default")
+        return default
+    metrics.inc("gas_limit_total", source="estimate")
+    return profiles.record(key, estimate)
+
+
+def observe(tx, receipt, contract=None):
+    # Откат, съевший почти весь лимит, считаем out-of-gas: профиль переоценим
+    if receipt["status"] != 1 and receipt["gasUsed"] >= tx["gas"] * 0.98:
+        profiles.invalidate(GasProfiles.key(contract or tx["to"], tx.get("data", b"")))
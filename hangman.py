@@ -1,24 +1,19 @@
 import asyncio
-import random
 import logging
-from web3 import Web3
+import random
+from collections import deque
+from functools import lru_cache
 from eth_abi import encode
+from eth_utils import keccak, to_bytes, to_checksum_address
 import config
-import requests
-from colorama import Fore, Style, init
-
-init(autoreset=True)  # Автоматически сбрасывать цвета после каждого print
-
-# -------------------- Настройка логов --------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(message)s",
-    handlers=[
-        logging.FileHandler("mint_operations.log", encoding="utf-8"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+import engine
+import gas
+import logs
+import registry
+import scheduler
+import sender
+import signer
+from nonces import get_nonce, release_nonces
 
 # -------------------- Константы --------------------
 WORDS = [
@@ -58,83 +53,101 @@ HANGMAN_FACTORY_ABI = [
 ]
 
 RPC_URL = "https://sepolia.base.org"
+GAME_PROFILE = "HangmanGame"  # у каждого игрока свой контракт игры, профиль газа общий
 
-# -------------------- Цвета --------------------
-COLOR_LIST = [Fore.RED, Fore.GREEN, Fore.YELLOW, Fore.CYAN, Fore.MAGENTA]
-wallet_colors = {}
+# -------------------- Calldata --------------------
+# Возможных букв всего 26, поэтому ABI-кодирование каждой делается один раз.
+CREATE_GAME_SELECTOR = bytes.fromhex("9feb6c1b")
+GUESS_SELECTOR = bytes.fromhex("662a6559")
 
+@lru_cache(maxsize=None)
+def create_game_calldata(address_hex):
+    return CREATE_GAME_SELECTOR + bytes(12) + bytes.fromhex(address_hex)
+
+@lru_cache(maxsize=32)
+def guess_calldata(letter):
+    return GUESS_SELECTOR + encode(["string"], [letter])
+
+# -------------------- Цвета --------------------
 def assign_colors(wallets):
-    for i, wallet in enumerate(wallets):
-        public = Web3().eth.account.from_key(wallet).address
-        public = Web3.to_checksum_address(public)
-        wallet_colors[public] = COLOR_LIST[i % len(COLOR_LIST)]
-
-def colorize_for_wallet(text, public):
-    color = wallet_colors.get(public, Fore.CYAN)
-    return f"{color}{text}{Style.RESET_ALL}"
-
-# -------------------- RPC с прокси --------------------
-def connect_to_rpc_with_proxy(proxy=None):
-    session = None
-    if proxy:
-        session = requests.Session()
-        session.proxies = {"http": proxy, "https": proxy}
-    w3 = Web3(Web3.HTTPProvider(RPC_URL, session=session))
-    if not w3.is_connected():
-        raise Exception(f"❌ Could not connect to RPC: {RPC_URL}")
-    print(f"{Fore.MAGENTA}✅ Connected to RPC: {RPC_URL}{Style.RESET_ALL}")
-    return w3
-
-# -------------------- Управление nonce --------------------
-wallet_nonces = {}
-def get_nonce(w3, wallet):
-    if wallet not in wallet_nonces:
-        public = Web3().eth.account.from_key(wallet).address
-        wallet_nonces[wallet] = w3.eth.get_transaction_count(Web3.to_checksum_address(public))
-    nonce = wallet_nonces[wallet]
-    wallet_nonces[wallet] += 1
-    return nonce
+    registry.register(wallets)
 
 # -------------------- Универсальная транзакция --------------------
-async def send_transaction(w3, wallet, tx):
-    signed_tx = w3.eth.account.sign_transaction(tx, wallet)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+async def send_for_receipt(w3, wallet, tx, contract=None):
+    tx["gas"] = await gas.gas_limit(w3, tx, contract, default=tx["gas"])
+    tx_hash = await sender.broadcast(w3, wallet, tx)
+    receipt = await sender.confirm(w3, wallet, tx, tx_hash)
+    gas.observe(tx, receipt, contract)
     if receipt["status"] != 1:
         raise Exception(f"[{tx['from']}] transaction failed")
-    return tx_hash.hex()
+    return receipt
+
+async def send_transaction(w3, wallet, tx, contract=None):
+    receipt = await send_for_receipt(w3, wallet, tx, contract)
+    return receipt["transactionHash"].hex()
+
+# -------------------- Адрес игры --------------------
+# Каждый create_game создаёт новый контракт игры, поэтому адрес берётся из
+# события GameCreated в квитанции создания; eth_call к фабрике — только
+# запасной путь, если события в квитанции нет.
+GAME_CREATED_TOPIC = keccak(text="GameCreated(address,address)")
+
+_factory_contracts = {}
+
+def factory_contract(w3):
+    contract = _factory_contracts.get(w3)
+    if contract is None:
+        contract = _factory_contracts[w3] = w3.eth.contract(address=HANGMAN_FACTORY_ADDRESS, abi=HANGMAN_FACTORY_ABI)
+    return contract
+
+def decode_game_created(log):
+    topics = [to_bytes(hexstr=t) if isinstance(t, str) else bytes(t) for t in log["topics"]]
+    if len(topics) < 2 or topics[0] != GAME_CREATED_TOPIC:
+        return None
+    if log["address"].lower() != HANGMAN_FACTORY_ADDRESS.lower():
+        return None
+    data = to_bytes(hexstr=log["data"]) if isinstance(log["data"], str) else bytes(log["data"])
+    return to_checksum_address(topics[1][-20:]), to_checksum_address(data[12:32])
 
 # -------------------- Создание игры --------------------
 async def create_game(w3, wallet):
-    public = w3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
+    record = registry.get(wallet)
+    public = record.address
     tx = {
         "chainId": CHAIN_ID,
-        "data": f"0x9feb6c1b000000000000000000000000{public.lower()[2:]}",
+        "data": create_game_calldata(record.address_hex),
         "from": public,
         "gas": random.randint(1700000, 2300000),
-        "gasPrice": w3.eth.gas_price,
-        "nonce": get_nonce(w3, wallet),
+        **await gas.fees(w3),
+        "nonce": await get_nonce(w3, wallet),
         "to": HANGMAN_FACTORY_ADDRESS,
     }
-    await send_transaction(w3, wallet, tx)
-    factory_contract = w3.eth.contract(address=HANGMAN_FACTORY_ADDRESS, abi=HANGMAN_FACTORY_ABI)
-    return factory_contract.functions.getGameAddressByPlayer(public).call()
+    receipt = await send_for_receipt(w3, wallet, tx)
+    for log in receipt["logs"]:
+        decoded = decode_game_created(log)
+        if decoded and decoded[0] == public:
+            return decoded[1]
+
+    # Событие не нашлось — спрашиваем фабрику
+    return await engine.call(factory_contract(w3).functions.getGameAddressByPlayer(public).call)
 
 # -------------------- Угадывание буквы --------------------
-async def guess_letter(w3, wallet, game_address, letter):
-    public = w3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-    encoded_string = encode(["string"], [letter]).hex()[2:]
-    tx_data = f"0x662a655900{encoded_string}"
-    tx = {
+def guess_tx(public, game_address, letter, nonce, fees):
+    return {
         "chainId": CHAIN_ID,
-        "data": tx_data,
+        "data": guess_calldata(letter),
         "from": public,
         "gas": random.randint(1100000, 1500000),
-        "gasPrice": w3.eth.gas_price,
-        "nonce": get_nonce(w3, wallet),
+        **fees,
+        "nonce": nonce,
         "to": game_address,
     }
-    await send_transaction(w3, wallet, tx)
+
+async def guess_letter(w3, wallet, game_address, letter):
+    public = registry.get(wallet).address
+    fees = await gas.fees(w3)
+    tx = guess_tx(public, game_address, letter, await get_nonce(w3, wallet), fees)
+    await send_transaction(w3, wallet, tx, GAME_PROFILE)
 
 # -------------------- Симуляция состояния игры --------------------
 def simulate_game_state(word, guessed_letters, lives):
@@ -143,19 +156,16 @@ def simulate_game_state(word, guessed_letters, lives):
     has_lost = lives <= 0 and not has_won
     return {"display_word": display_word, "lives": lives, "has_won": has_won, "has_lost": has_lost}
 
-# -------------------- Игра на одном кошельке --------------------
-async def play_hangman_single(w3, wallet):
-    public = Web3().eth.account.from_key(wallet).address
-    public = Web3.to_checksum_address(public)
-    game_address = await create_game(w3, wallet)
-    secret_word = random.choice(WORDS)
-
+# -------------------- План игры --------------------
+# Исход каждой буквы известен заранее, поэтому всю последовательность
+# можно спланировать офлайн, до отправки первой транзакции.
+def plan_guesses(secret_word):
     guessed_letters = set()
     lives = MAX_LIVES
     word_letters = list(secret_word)
     available_wrong_letters = [c for c in "abcdefghijklmnopqrstuvwxyz" if c not in secret_word]
 
-    round_counter = 1
+    guesses = []
     while lives > 0 and word_letters:
         if random.random() < getattr(config, "ERROR_PROBABILITY", 0) and available_wrong_letters:
             letter = random.choice(available_wrong_letters)
@@ -166,26 +176,106 @@ async def play_hangman_single(w3, wallet):
             word_letters.remove(letter)
             letter_type = "✅ correct"
 
-        logger.info(colorize_for_wallet(
-            f"[{public}] Round {round_counter} | Guessing letter '{letter}' ({letter_type}) | Lives: {lives}",
-            public
-        ))
-        await guess_letter(w3, wallet, game_address, letter)
+        lives_before = lives
         guessed_letters.add(letter)
         if letter not in secret_word:
             lives -= 1
-
         state = simulate_game_state(secret_word, guessed_letters, lives)
-        if state["has_won"]:
-            logger.info(colorize_for_wallet(f"[{public}] Game completed: 🎉 Won!", public))
+        guesses.append({"letter": letter, "type": letter_type, "lives": lives_before, "state": state})
+        if state["has_won"] or state["has_lost"]:
             break
-        if state["has_lost"]:
-            logger.info(colorize_for_wallet(f"[{public}] Game completed: ❌ Lost!", public))
+    return guesses
+
+def log_guess(public, round_counter, guess):
+    logs.log(
+        f"[{public}] Round {round_counter} | Guessing letter '{guess['letter']}' ({guess['type']}) | Lives: {guess['lives']}",
+        wallet=public
+    )
+
+def log_game_result(public, state):
+    if state["has_won"]:
+        logs.log(f"[{public}] Game completed: 🎉 Won!", wallet=public)
+    elif state["has_lost"]:
+        logs.log(f"[{public}] Game completed: ❌ Lost!", wallet=public)
+
+# -------------------- Игра на одном кошельке --------------------
+async def play_hangman_single(w3, wallet):
+    public = registry.get(wallet).address
+    game_address = await create_game(w3, wallet)
+    secret_word = random.choice(WORDS)
+    guesses = plan_guesses(secret_word)
+
+    for round_counter, guess in enumerate(guesses, start=1):
+        log_guess(public, round_counter, guess)
+        await guess_letter(w3, wallet, game_address, guess["letter"])
+
+        state = guess["state"]
+        if state["has_won"] or state["has_lost"]:
+            log_game_result(public, state)
             break
 
         # Рандомная задержка между буквами
-        await asyncio.sleep(random.uniform(LETTER_DELAY[0], LETTER_DELAY[1]))
-        round_counter += 1
+        await scheduler.sleep(random.uniform(LETTER_DELAY[0], LETTER_DELAY[1]))
+
+# -------------------- Конвейерная игра --------------------
+# Все буквы получают последовательные nonce заранее и уходят в сеть окном
+# из PIPELINE_WINDOW транзакций, не дожидаясь подтверждения предыдущей.
+# Игра занимает примерно одно время подтверждения вместо N.
+async def confirm_guess(w3, wallet, round_counter, guess, tx, tx_hash):
+    public = registry.get(wallet).address
+    receipt = await sender.confirm(w3, wallet, tx, tx_hash)
+    gas.observe(tx, receipt, GAME_PROFILE)
+    if receipt["status"] != 1:
+        raise Exception(f"[{public}] Round {round_counter}: guess '{guess['letter']}' reverted | {receipt['transactionHash'].hex()}")
+    return receipt
+
+async def play_hangman_pipelined(w3, wallet):
+    record = registry.get(wallet)
+    public = record.address
+    window = max(1, getattr(config, "PIPELINE_WINDOW", 4))
+    game_address = await create_game(w3, wallet)
+    secret_word = random.choice(WORDS)
+    guesses = plan_guesses(secret_word)
+
+    # Комиссия — до резерва nonce: если запрос упадёт, резервировать нечего
+    fees = await gas.fees(w3)
+    first_nonce = await get_nonce(w3, wallet, count=len(guesses))
+    pending = deque()
+    sent = 0
+    try:
+        # Вся последовательность букв подписывается одной пачкой до отправки
+        txs = [guess_tx(public, game_address, g["letter"], first_nonce + i, fees) for i, g in enumerate(guesses)]
+        gas_limit = await gas.gas_limit(w3, txs[0], GAME_PROFILE, default=txs[0]["gas"])
+        for tx in txs:
+            tx["gas"] = gas_limit
+        signed_txs = await signer.sign_batch(record.key, txs)
+
+        for round_counter, (guess, tx, signed_tx) in enumerate(zip(guesses, txs, signed_txs), start=1):
+            if len(pending) >= window:
+                await confirm_guess(w3, wallet, *pending.popleft())
+            log_guess(public, round_counter, guess)
+            tx_hash = await sender.broadcast(w3, wallet, tx, signed_tx)
+            sent += 1
+            pending.append((round_counter, guess, tx, tx_hash))
+
+        # Подтверждаем весь хвост разом
+        results = await asyncio.gather(
+            *(confirm_guess(w3, wallet, *item) for item in pending), return_exceptions=True
+        )
+        pending.clear()
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+    finally:
+        # Дожидаемся уже отправленных, чтобы их nonce точно были заняты
+        if pending:
+            await asyncio.gather(
+                *(sender.confirm(w3, wallet, item[2], item[3]) for item in pending),
+                return_exceptions=True
+            )
+        release_nonces(wallet, first_nonce + sent, first_nonce + len(guesses))
+
+    log_game_result(public, guesses[-1]["state"])
 
 # -------------------- Обработка всех кошельков --------------------
 async def play_hangman_all(w3, wallets):
@@ -199,12 +289,13 @@ async def play_hangman_all(w3, wallets):
             # Рандомная задержка между кошельками
             await asyncio.sleep(random.uniform(LETTER_DELAY[0], LETTER_DELAY[1]))
         except Exception as e:
-            public = Web3().eth.account.from_key(wallet).address
-            public = Web3.to_checksum_address(public)
-            logger.error(colorize_for_wallet(f"[{public}] Error: {e}", public))
+            public = registry.get(wallet).address
+            logs.log(f"[{public}] Error: {e}", wallet=public, level=logging.ERROR)
 
 # -------------------- Запуск --------------------
 if __name__ == "__main__":
+    from transport import connect_to_rpc_with_proxy
+
     with open("wallets.txt", "r") as f:
         wallets = [line.strip() for line in f if line.strip()]
 
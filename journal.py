@@ -0,0 +1,173 @@
+import asyncio
+import contextvars
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+# -------------------- Журнал запуска --------------------
+# Append-only журнал в SQLite: запланированные раунды, отправленные хэши и их
+# статус по каждому кошельку. После падения main.py перечитывает журнал,
+# сверяет висящие хэши с сетью и выполняет только незаконченную работу.
+# Записи копятся в буфере и пишутся пачками в отдельном потоке.
+JOURNAL_FILE = getattr(config, "JOURNAL_FILE", "journal.db")
+JOURNAL_FLUSH_INTERVAL = getattr(config, "JOURNAL_FLUSH_INTERVAL", 1.0)
+JOURNAL_BATCH = getattr(config, "JOURNAL_BATCH", 500)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    grp INTEGER, mode TEXT, rounds INTEGER,
+    started REAL, finished REAL
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    run INTEGER, wallet TEXT, round INTEGER, func TEXT, status TEXT, updated REAL,
+    PRIMARY KEY (run, wallet, round)
+);
+CREATE TABLE IF NOT EXISTS txs (
+    hash TEXT PRIMARY KEY, run INTEGER, wallet TEXT, round INTEGER,
+    nonce INTEGER, selector TEXT, status TEXT, updated REAL
+);
+CREATE INDEX IF NOT EXISTS txs_run_status ON txs (run, status);
+"""
+
+# Раунд, в рамках которого идёт текущая транзакция: (run, round)
+current_round = contextvars.ContextVar("journal_round", default=None)
+
+
+class Journal:
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        self.writes = 0
+        self.flushes = 0
+        self._buffer = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        self._task = None
+
+    # ---- запуски ----
+    def open_run(self, group, mode, rounds):
+        row = self.db.execute(
+            "SELECT id FROM runs WHERE grp = ? AND mode = ? AND rounds = ? AND finished IS NULL "
+            "ORDER BY id DESC LIMIT 1",
+            (group, mode, rounds),
+        ).fetchone()
+        if row:
+            return row[0], True
+        cursor = self.db.execute(
+            "INSERT INTO runs (grp, mode, rounds, started) VALUES (?, ?, ?, ?)",
+            (group, mode, rounds, time.time()),
+        )
+        self.db.commit()
+        return cursor.lastrowid, False
+
+    def finish_run(self, run):
+        self._write("UPDATE runs SET finished = ? WHERE id = ?", (time.time(), run))
+
+    def load_rounds(self, run):
+        plan = {}
+        for wallet, round_num, func, status in self.db.execute(
+            "SELECT wallet, round, func, status FROM rounds WHERE run = ?", (run,)
+        ):
+            plan.setdefault(wallet, {})[round_num] = [func, status]
+        return plan
+
+    def pending_txs(self, run):
+        return self.db.execute(
+            "SELECT hash, wallet, round FROM txs WHERE run = ? AND status = 'sent'", (run,)
+        ).fetchall()
+
+    def mined_rounds(self, run):
+        return set(self.db.execute(
+            "SELECT DISTINCT wallet, round FROM txs WHERE run = ? AND status = 'mined'", (run,)
+        ).fetchall())
+
+    # ---- записи ----
+    def plan_round(self, run, wallet, round_num, func):
+        self._write(
+            "INSERT OR IGNORE INTO rounds (run, wallet, round, func, status, updated) VALUES (?, ?, ?, ?, 'planned', ?)",
+            (run, wallet, round_num, func, time.time()),
+        )
+
+    def round_status(self, run, wallet, round_num, status):
+        self._write(
+            "UPDATE rounds SET status = ?, updated = ? WHERE run = ? AND wallet = ? AND round = ?",
+            (status, time.time(), run, wallet, round_num),
+        )
+
+    def tx_sent(self, wallet, nonce, tx_hash, selector):
+        run, round_num = current_round.get() or (None, None)
+        self._write(
+            "INSERT OR REPLACE INTO txs (hash, run, wallet, round, nonce, selector, status, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, 'sent', ?)",
+            (tx_hash, run, wallet, round_num, nonce, selector, time.time()),
+        )
+
+    def tx_status(self, tx_hash, status):
+        self._write("UPDATE txs SET status = ?, updated = ? WHERE hash = ?", (status, time.time(), tx_hash))
+
+    def _write(self, sql, params):
+        self._buffer.append((sql, params))
+        self.writes += 1
+        if len(self._buffer) >= JOURNAL_BATCH:
+            self._flush_soon()
+
+    # ---- сброс на диск ----
+    def _commit(self, batch):
+        with self.db:
+            for sql, params in batch:
+                self.db.execute(sql, params)
+
+    def _take(self):
+        batch, self._buffer = self._buffer, []
+        if batch:
+            self.flushes += 1
+        return batch
+
+    def _flush_soon(self):
+        batch = self._take()
+        if batch:
+            self._executor.submit(self._commit, batch)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(JOURNAL_FLUSH_INTERVAL)
+            self._flush_soon()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def flush(self):
+        batch = self._take()
+        self._executor.submit(self._commit, batch).result()
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.flush()
+        self._executor.shutdown(wait=True)
+        self.db.close()
+
+
+# -------------------- Активный журнал --------------------
+active = None
+
+
+def open_journal(path=JOURNAL_FILE):
+    global active
+    active = Journal(path)
+    return active
+
+
+def tx_sent(wallet, nonce, tx_hash, selector):
+    if active is not None:
+        active.tx_sent(wallet, nonce, tx_hash, selector)
+
+
+def tx_status(tx_hash, status):
+    if active is not None:
+        active.tx_status(tx_hash, status)
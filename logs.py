@@ -0,0 +1,124 @@
+import atexit
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import config
+
+# -------------------- Логирование --------------------
+# Один конвейер для main, comfy и hangman: на event loop запись только
+# кладётся в очередь, а форматирование, цвета кошельков, вывод в консоль
+# и запись в файл с ротацией делает поток QueueListener. Повторяющиеся
+# строки (например "Waiting Xs") прореживаются: не чаще одной за
+# LOG_SAMPLE_INTERVAL секунд, с числом пропущенных.
+LOG_FILE = getattr(config, "LOG_FILE", "mint_operations.log")
+LOG_MAX_BYTES = getattr(config, "LOG_MAX_BYTES", 10 * 1024 * 1024)
+LOG_BACKUPS = getattr(config, "LOG_BACKUPS", 3)
+LOG_SAMPLE_INTERVAL = getattr(config, "LOG_SAMPLE_INTERVAL", 5.0)
+
+COLORS = {
+    "reset": "\033[0m",
+    "red": "\033[91m",
+    "green": "\033[92m",
+    "yellow": "\033[93m",
+    "cyan": "\033[96m",
+    "magenta": "\033[95m",
+}
+
+logger = logging.getLogger("wallets")
+_handler = None
+_listener = None
+_pid = None  # процесс, в котором запущен _listener
+
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        wallet = getattr(record, "wallet", None)
+        if wallet:
+            import registry  # только в потоке логирования, logs не тянет eth_account при импорте
+            color = registry.color_for(wallet)
+        else:
+            color = COLORS.get(getattr(record, "color", None) or "", "")
+        return f"{color}{text}{COLORS['reset']}" if color else text
+
+
+class Sampler(logging.Filter):
+    def __init__(self, interval=LOG_SAMPLE_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self.last = {}
+        self.skipped = {}
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None or not self.interval:
+            return True
+        now = time.monotonic()
+        if now - self.last.get(key, float("-inf")) < self.interval:
+            self.skipped[key] = self.skipped.get(key, 0) + 1
+            return False
+        self.last[key] = now
+        skipped = self.skipped.pop(key, 0)
+        if skipped:
+            record.msg = f"{record.msg} (+{skipped} similar)"
+        return True
+
+
+def setup(path=None):
+    global _handler, _listener, _pid
+    if _listener is not None:
+        if _pid == os.getpid():
+            return logger
+        # Шард-процесс после fork: конвейер родителя унаследован, но его потока
+        # здесь нет — запись ушла бы в очередь, которую никто не читает
+        logger.removeHandler(_handler)
+        _handler = _listener = None
+    records = queue.SimpleQueue()
+    try:
+        from colorama import just_fix_windows_console  # ANSI-цвета в консоли Windows
+        just_fix_windows_console()
+    except ImportError:
+        pass
+    console = logging.StreamHandler()
+    console.setFormatter(ConsoleFormatter("%(message)s"))
+    handlers = [console]
+    path = path or LOG_FILE
+    if path:
+        file_handler = RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True
+        )
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        handlers.append(file_handler)
+    _listener = QueueListener(records, *handlers)
+    _listener.start()
+    _pid = os.getpid()
+
+    _handler = QueueHandler(records)
+    _handler.addFilter(Sampler())
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def stop():
+    # Дописывает очередь до конца; нужно вызвать перед выходом из шард-процесса
+    global _handler, _listener
+    if _listener is None or _pid != os.getpid():
+        return
+    _listener.stop()
+    logger.removeHandler(_handler)
+    for handler in _listener.handlers:
+        handler.close()
+    _handler = _listener = None
+
+
+atexit.register(stop)
+
+
+def log(message, color=None, wallet=None, level=logging.INFO, sample=None):
+    if _listener is None or _pid != os.getpid():
+        setup()
+    logger.log(level, message, extra={"color": color, "wallet": wallet, "sample": sample})
@@ -1,10 +1,28 @@
+import time
+STARTED = time.perf_counter()  # для отчёта --dry-run о времени старта
+import argparse
 import asyncio
 import random
-from web3 import Web3
-from config import TX_DELAY, shuffle_wallets
-from hangman import play_hangman_single as play_hangman
-from comfy import mint_usdc, mint_cusdc, shield_usdc, unshield_cusdc
-from hangman import connect_to_rpc_with_proxy
+import sys
+from array import array
+from functools import partial
+import registry
+import engine
+import gas
+import journal
+import logs
+import metrics
+import nonces
+import plan
+import preflight
+import receipts
+import scheduler
+import signer
+from config import shuffle_wallets, HANGMAN_PIPELINE, JOURNAL_FILE, PLAN_DUMP, RPC_URLS
+from metrics import METRICS_FILE, METRICS_HOST, METRICS_PORT
+from hangman import play_hangman_single, play_hangman_pipelined
+from comfy import mint_usdc, mint_cusdc, shield_usdc, unshield_cusdc, random_amount_for_function, remember_allowances
+IMPORTED = time.perf_counter()
 
 
 
@@ -12,95 +30,251 @@ from hangman import connect_to_rpc_with_proxy
 ROUNDS_PER_WALLET = 2
 MODE = "comfy"  # hangman, comfy, mixed
 
+play_hangman = play_hangman_pipelined if HANGMAN_PIPELINE else play_hangman_single
+RECONCILE_TIMEOUT = 60  # сколько ждать квитанции висящих хэшей при возобновлении
+
 # ------------------------ ВЫБОР ------------------------
 SELECTED_GROUP = 0   # индекс группы приватников (0 = первая, 1 = вторая, ...)
 SELECTED_PROXY = 0   # индекс прокси (0 = первый, 1 = второй, ...)
 
-# ------------------------ ЦВЕТА ------------------------
-COLORS = {
-    "reset": "\033[0m",
-    "red": "\033[91m",
-    "green": "\033[92m",
-    "yellow": "\033[93m",
-    "cyan": "\033[96m",
-    "magenta": "\033[95m",
-}
-
-def colorize(text, color="cyan"):
-    return f"{COLORS.get(color,'')}{text}{COLORS['reset']}"
-
+# ------------------------ ВЫВОД ------------------------
+# Цвет и запись в консоль/файл — в потоке логирования (logs.py)
 def print_colored(message, color="cyan"):
-    print(colorize(message, color))
+    logs.log(message, color=color)
 
 
 # ------------------------ ПРОКСИ ------------------------
-try:
-    with open("proxies.txt", "r") as f:
-        proxies = [line.strip() for line in f if line.strip()]
-    PROXY = proxies[SELECTED_PROXY] if SELECTED_PROXY < len(proxies) else None
-except:
-    PROXY = None
+def load_proxies(file_path="proxies.txt"):
+    try:
+        with open(file_path, "r") as f:
+            return [line.strip() for line in f if line.strip()]
+    except OSError:
+        return []
+
+proxies = load_proxies()
+PROXY = proxies[SELECTED_PROXY] if SELECTED_PROXY < len(proxies) else None
 
 # ------------------------ RPC ------------------------
-w3 = connect_to_rpc_with_proxy(PROXY)
+# Подключение делается при запуске группы, а не при импорте:
+# шард-процессы подключаются каждый через свой прокси. web3 и requests
+# (transport.py) импортируются только здесь, поэтому --dry-run их не грузит.
+w3 = None
 
-# ------------------------ Индивидуальная задержка ------------------------
-wallet_delays = {}
+def connect(proxy):
+    global w3, PROXY
+    from transport import connect_to_rpc_with_proxy
+    PROXY = proxy
+    w3 = connect_to_rpc_with_proxy(proxy)
+    return w3
+
+# Вызывается после каждого раунда: (адрес, номер раунда, функция, успех)
+progress_hook = None
 
+# ------------------------ Индивидуальная задержка ------------------------
 def get_wallet_delay(wallet):
-    if wallet not in wallet_delays:
-        wallet_delays[wallet] = random.uniform(TX_DELAY[0], TX_DELAY[1])
-    return wallet_delays[wallet]
+    return registry.get(wallet).delay
 
-async def wallet_delay(wallet):
-    delay = get_wallet_delay(wallet)
-    public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-    print_colored(f"⏱ [{public}] Waiting {delay:.1f}s before next function", "yellow")
-    await asyncio.sleep(delay)
+def wallet_delay(wallet):
+    record = registry.get(wallet)
+    delay = record.delay
+    logs.log(f"⏱ [{record.address}] Waiting {delay:.1f}s before next function", color="yellow", sample="waiting")
+    return delay
 
 # ------------------------ Чтение приватников ------------------------
-def load_wallets(file_path, group_index):
+def load_groups(file_path):
     with open(file_path, "r") as f:
         content = f.read().strip()
     groups_raw = [group.strip().splitlines() for group in content.split("---")]
-    wallets = []
-    if group_index < len(groups_raw):
-        for line in groups_raw[group_index]:
+    groups = []
+    for group in groups_raw:
+        wallets = []
+        for line in group:
             line = line.strip()
             if line and not line.startswith("#"):
                 wallets.append(line)
-    return wallets
+        groups.append(wallets)
+    return groups
+
+def load_wallets(file_path, group_index):
+    groups = load_groups(file_path)
+    return groups[group_index] if group_index < len(groups) else []
+
+def wallet_line_numbers(file_path, group_index):
+    # Номера строк файла для ключей группы — в том же порядке, что load_wallets
+    numbers, group = [], 0
+    with open(file_path, "r") as f:
+        for line_no, line in enumerate(f, start=1):
+            group += line.count("---")
+            line = line.strip()
+            if group == group_index and line and not line.startswith("#") and "---" not in line:
+                numbers.append(line_no)
+    return numbers
 
 # ------------------------ ОБРАБОТКА КОШЕЛЬКА ------------------------
-async def process_wallet(wallet: str):
-    public = Web3.to_checksum_address(Web3().eth.account.from_key(wallet).address)
-    print_colored(f"\n🔑 Wallet: {public}", "cyan")
-    if PROXY:
-        print_colored(f"🌐 Using proxy: {PROXY}", "yellow")
+# Функция по коду операции из plan.OPS
+OP_FUNCTIONS = (mint_usdc, mint_cusdc, shield_usdc, unshield_cusdc, play_hangman)
 
+def mode_functions():
     # Выбор функций в зависимости от режима
     if MODE == "hangman":
-        functions = [play_hangman]
+        return [play_hangman]
     elif MODE == "comfy":
-        functions = [mint_usdc, mint_cusdc, shield_usdc, unshield_cusdc]
+        return [mint_usdc, mint_cusdc, shield_usdc, unshield_cusdc]
     else:  # mixed
-        functions = [mint_usdc, mint_cusdc, shield_usdc, unshield_cusdc, play_hangman]
+        return [mint_usdc, mint_cusdc, shield_usdc, unshield_cusdc, play_hangman]
+
+# Один шаг = одна строка плана. Кошелёк не держит свою корутину между
+# раундами: шаг возвращает паузу, и планировщик сам вызовет следующий.
+async def process_step(execution_plan, cursor, totals, run, index):
+    wallet = execution_plan.wallets[index]
+    public = registry.get(wallet).address
+    row = cursor[index]
+    if row == execution_plan.offsets[index]:
+        print_colored(f"\n🔑 Wallet: {public}", "cyan")
+        if PROXY:
+            print_colored(f"🌐 Using proxy: {PROXY}", "yellow")
 
+    round_num = execution_plan.round[row]
+    op = execution_plan.op[row]
+    func = OP_FUNCTIONS[op]
+    print_colored(f"⏳ [{public}] Round {round_num}: starting {func.__name__}", "magenta")
+    journal.current_round.set((run, round_num))
+    journal.active.round_status(run, public, round_num, "started")
+    started = time.perf_counter()
     try:
+        if op == plan.HANGMAN_OP:
+            await func(w3, wallet)
+        else:
+            await func(w3, wallet, execution_plan.amount[row], execution_plan.calldata[row])
+        ok = True
+        print_colored(f"✅ [{public}] Round {round_num}: {func.__name__} finished successfully", "green")
+    except Exception as e:
+        ok = False
+        print_colored(f"❌ [{public}] Round {round_num}: {func.__name__} failed | {e}", "red")
+    metrics.observe("op_seconds", time.perf_counter() - started, op=func.__name__, status="ok" if ok else "failed")
+    journal.active.round_status(run, public, round_num, "done" if ok else "failed")
+    totals["done" if ok else "failed"] += 1
+    if progress_hook:
+        progress_hook(public, round_num, func.__name__, ok)
+
+    cursor[index] = row + 1
+    if row + 1 == execution_plan.offsets[index + 1]:
+        return None
+    # Задержка между функциями
+    return wallet_delay(wallet)
+
+# ------------------------ ЖУРНАЛ И ВОЗОБНОВЛЕНИЕ ------------------------
+async def reconcile_journal(jr, run):
+    # Хэши, отправленные до падения, сверяем с сетью
+    pending = jr.pending_txs(run)
+    if not pending:
+        return
+    print_colored(f"🔁 Reconciling {len(pending)} pending transactions from journal", "yellow")
+    results = await asyncio.gather(
+        *(receipts.wait_for_receipt(w3, tx_hash, RECONCILE_TIMEOUT) for tx_hash, _, _ in pending),
+        return_exceptions=True
+    )
+    for (tx_hash, _, _), result in zip(pending, results):
+        if isinstance(result, receipts.TransactionDropped):
+            jr.tx_status(tx_hash, "dropped")
+        elif not isinstance(result, Exception):
+            jr.tx_status(tx_hash, "mined" if result["status"] == 1 else "reverted")
+    jr.flush()
+
+def plan_rounds(jr, run, records, journaled, snapshot=None):
+    names = [func.__name__ for func in mode_functions()]
+    mined = jr.mined_rounds(run)
+    execution_plan = plan.Plan()
+    for record in records:
+        balances = snapshot.get(record.address) if snapshot else None
+        if not preflight.has_gas(balances):
+            print_colored(f"⛽ [{record.address}] Not enough ETH for gas ({balances.eth / 10 ** 18:.6f}), skipping", "red")
+            continue
+        wallet_rounds = journaled.get(record.address, {})
+        todo = []
         for round_num in range(1, ROUNDS_PER_WALLET + 1):
-            func = random.choice(functions)
-            print_colored(f"⏳ [{public}] Round {round_num}: starting {func.__name__}", "magenta")
+            func_name, status = wallet_rounds.get(round_num, (None, None))
+            if status in ("done", "failed"):
+                continue
+            if status == "started" and (record.address, round_num) in mined:
+                # Раунд успел отправить транзакции до падения — газ повторно не платим
+                jr.round_status(run, record.address, round_num, "done")
+                continue
+            if func_name is None:
+                func_name, amount = preflight.choose(names, balances)
+                jr.plan_round(run, record.address, round_num, func_name)
+            else:
+                # Раунд из журнала: операцию не меняем, только подгоняем сумму
+                amount = preflight.fit(func_name, random_amount_for_function(func_name), balances)
+                preflight.apply(func_name, amount, balances)
+            todo.append((round_num, func_name, amount))
+        execution_plan.add_wallet(record.key, todo)
+    return execution_plan
+
+# ------------------------ ЗАПУСК ГРУППЫ ------------------------
+async def run_group(wallets, group, proxy, journal_file=JOURNAL_FILE, metrics_file=METRICS_FILE):
+    started = time.perf_counter()
+    # Подключение (импорт web3 + is_connected) идёт в потоке, пока разворачиваются ключи
+    connecting = asyncio.ensure_future(engine.call(connect, proxy))
+    try:
+        records = registry.register(wallets)
+    except Exception:
+        connecting.cancel()
+        raise
+
+    jr = journal.open_journal(journal_file or ":memory:")
+    run, resumed = jr.open_run(group, MODE, ROUNDS_PER_WALLET)
+    jr.start()
+    try:
+        await connecting
+        journaled = {}
+        if resumed:
+            print_colored(f"📒 Resuming run #{run} from {journal_file}", "yellow")
+            await reconcile_journal(jr, run)
+            journaled = jr.load_rounds(run)
+
+        addresses = [record.address for record in records]
+        await nonces.manager.prime(w3, addresses)
+        snapshot = None
+        if preflight.PREFLIGHT:
             try:
-                await func(w3, wallet)
-                print_colored(f"✅ [{public}] Round {round_num}: {func.__name__} finished successfully", "green")
+                snapshot = await preflight.fetch(w3, addresses)
+                remember_allowances({address: b.allowance for address, b in snapshot.items()})
+                print_colored(
+                    f"🔎 Preflight: balances of {len(snapshot)} wallets in "
+                    f"{-(-len(addresses) // preflight.PREFLIGHT_CHUNK)} multicalls", "yellow"
+                )
             except Exception as e:
-                print_colored(f"❌ [{public}] Round {round_num}: {func.__name__} failed | {e}", "red")
+                print_colored(f"⚠️ Preflight failed, planning without balances: {e}", "yellow")
+        execution_plan = plan_rounds(jr, run, records, journaled, snapshot)
+        if PLAN_DUMP:
+            execution_plan.dump(PLAN_DUMP)
+            print_colored(f"🗺 Plan with {len(execution_plan)} steps written to {PLAN_DUMP}", "yellow")
 
-            # Задержка между функциями
-            await wallet_delay(wallet)
+        cursor = array("I", execution_plan.offsets[:-1])
+        totals = {"done": 0, "failed": 0}
+        sched = scheduler.Scheduler(partial(process_step, execution_plan, cursor, totals, run))
+        await sched.run(index for index in range(len(execution_plan.wallets)) if execution_plan.rows(index))
+        jr.finish_run(run)
+    finally:
+        jr.close()
+        gas.profiles.flush()
+        if metrics_file:
+            metrics.collector.write(metrics_file)
 
-    except Exception as e:
-        print_colored(f"❌ [{public}] Wallet processing failed: {e}", "red")
+    oracle = gas.get_oracle(w3)
+    return {
+        "group": group,
+        "proxy": proxy,
+        "wallets": len(wallets),
+        "rounds_done": totals["done"],
+        "rounds_failed": totals["failed"],
+        "gas_cache_hits": oracle.hits,
+        "gas_rpc_calls": oracle.misses,
+        "signing": signer.signer.stats(),
+        "scheduler": sched.stats(),
+        "elapsed": time.perf_counter() - started,
+    }
 
 # ------------------------ ОСНОВНОЙ ЦИКЛ ------------------------
 async def main():
@@ -112,11 +286,94 @@ async def main():
     print_colored(f"🚀 Starting in mode: {MODE} | Using proxy #{SELECTED_PROXY+1}", "cyan")
     print_colored(f"👛 Loaded {len(wallets)} wallets from group #{SELECTED_GROUP+1}", "yellow")
 
-    tasks = [process_wallet(wallet) for wallet in wallets]
-    await asyncio.gather(*tasks)
+    if METRICS_PORT:
+        metrics.collector.serve(METRICS_PORT)
+        print_colored(f"📈 Metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics", "yellow")
+
+    summary = await run_group(wallets, SELECTED_GROUP, PROXY)
 
     print_colored("🎉 All wallet operations completed", "green")
+    print_colored(f"⛽ Gas oracle: {summary['gas_cache_hits']} cache hits, {summary['gas_rpc_calls']} RPC calls", "cyan")
+    print_colored(f"⛽ Gas profiles: {gas.profiles.hits} cached limits, {gas.profiles.estimates} estimates", "cyan")
+    signing = summary["signing"]
+    print_colored(
+        f"✍️ Signed {signing['signed']} txs ({signing['batches']} batches) | "
+        f"{signing['avg_ms']:.1f} ms avg, {signing['per_second']:.0f} tx/s per worker ({signer.SIGNER_MODE}, {signer.SIGNER_WORKERS} workers)",
+        "cyan"
+    )
+    sched = summary["scheduler"]
+    print_colored(
+        f"🗓 Scheduler: {sched['steps']} steps, {sched['sleeps']} pauses, peak {sched['peak']}/{scheduler.SCHEDULER_CONCURRENCY} slots, "
+        f"max start lag {sched['max_lag']:.1f}s",
+        "cyan"
+    )
+    print_report()
+
+def print_report():
+    for header, rows in metrics.report():
+        print_colored(f"\n{header}", "magenta")
+        for row in rows:
+            print_colored(row, "cyan")
+
+# ------------------------ ПРОБНЫЙ ЗАПУСК ------------------------
+# --dry-run: конфиг, кошельки и план без единого сетевого запроса.
+# Журнал — в памяти, балансы и игры не проверяются.
+def validate_wallets(wallets, line_numbers):
+    records, errors, seen = [], [], set()
+    for line_no, key in zip(line_numbers, wallets):
+        try:
+            record = registry.get(key)
+        except Exception as e:
+            # Сам ключ в отчёт не попадает
+            errors.append(f"wallets.txt line {line_no}: invalid private key ({type(e).__name__})")
+            continue
+        if record.address in seen:
+            errors.append(f"wallets.txt line {line_no}: duplicate of {record.address}")
+            continue
+        seen.add(record.address)
+        records.append(record)
+    return records, errors
+
+def dry_run():
+    loaded = time.perf_counter()
+    wallets = load_wallets("wallets.txt", SELECTED_GROUP)
+    # Проверяем в порядке файла, чтобы в отчёте были настоящие номера строк
+    records, errors = validate_wallets(wallets, wallet_line_numbers("wallets.txt", SELECTED_GROUP))
+    if shuffle_wallets:
+        random.shuffle(records)
+    validated = time.perf_counter()
+
+    jr = journal.open_journal(":memory:")
+    run, _ = jr.open_run(SELECTED_GROUP, MODE, ROUNDS_PER_WALLET)
+    execution_plan = plan_rounds(jr, run, records, {})
+    jr.close()
+    planned = time.perf_counter()
+
+    print_colored(f"🧪 Dry run: mode {MODE}, {ROUNDS_PER_WALLET} rounds per wallet, group #{SELECTED_GROUP+1}", "cyan")
+    print_colored(f"👛 {len(records)} valid wallets, {len(errors)} rejected", "yellow" if errors else "green")
+    for error in errors:
+        print_colored(f"   ❌ {error}", "red")
+    ops = ", ".join(f"{name} × {count}" for name, count in execution_plan.summary().items())
+    print_colored(f"🗺 Plan: {len(execution_plan)} steps | {ops or 'nothing to do'}", "cyan")
+    if PLAN_DUMP:
+        execution_plan.dump(PLAN_DUMP)
+        print_colored(f"🗺 Plan written to {PLAN_DUMP}", "yellow")
+    print_colored(f"🌐 Would use proxy {PROXY or '-'} and RPC {', '.join(RPC_URLS)} (not contacted)", "cyan")
+    network = [name for name in ("web3", "requests") if name in sys.modules]
+    print_colored(
+        f"⏱ Startup: imports {IMPORTED - STARTED:.2f}s, wallets {validated - loaded:.2f}s, "
+        f"plan {planned - validated:.2f}s, total {planned - STARTED:.2f}s | "
+        f"network modules loaded: {', '.join(network) or 'none'}",
+        "magenta"
+    )
+    return not errors
 
 # ------------------------ ЗАПУСК ------------------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the selected wallet group")
+    parser.add_argument("--dry-run", action="store_true", help="validate config and wallets and print the plan without network access")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        sys.exit(0 if dry_run() else 1)
     asyncio.run(main())
@@ -0,0 +1,188 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+
+# -------------------- Метрики --------------------
+# Счётчики и гистограммы задержек в памяти процесса: этапы транзакции
+# (fees → nonce → estimate_gas → sign → send_raw_transaction → receipt),
+# RPC-запросы по методам и endpoint'ам, время каждой операции. Пишутся
+# из event loop и из потоков RPC-пула, поэтому под одной блокировкой.
+# Наружу — текст в формате Prometheus (файл METRICS_FILE или порт METRICS_PORT)
+# и сводная таблица в конце запуска.
+METRICS_FILE = getattr(config, "METRICS_FILE", None)
+METRICS_PORT = getattr(config, "METRICS_PORT", None)
+METRICS_HOST = getattr(config, "METRICS_HOST", "127.0.0.1")  # 0.0.0.0 — открыть наружу
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # Линейная интерполяция внутри корзины
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS[i - 1] if i else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), h.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {h.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        with open(path, "w") as f:
+            f.write(self.render())
+
+    def serve(self, port, host=METRICS_HOST):
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = collector.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+    def histogram_rows(self, name):
+        with self._lock:
+            return [
+                (dict(labels), h.count, h.sum / h.count, h.quantile(0.5), h.quantile(0.99), h.max)
+                for (n, labels), h in sorted(self.histograms.items()) if n == name and h.count
+            ]
+
+    def counter_rows(self, name):
+        with self._lock:
+            return [(dict(labels), value) for (n, labels), value in sorted(self.counters.items()) if n == name]
+
+
+collector = Metrics()
+
+
+def inc(name, value=1, **labels):
+    collector.inc(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    collector.observe(name, seconds, **labels)
+
+
+def timer(name, **labels):
+    return collector.timer(name, **labels)
+
+
+def stage(name):
+    return collector.timer("tx_stage_seconds", stage=name)
+
+
+def report():
+    # Сводная таблица для конца запуска: (заголовок, строки)
+    sections = []
+    for title, name, label in (
+        ("Operations", "op_seconds", "op"),
+        ("Transaction stages", "tx_stage_seconds", "stage"),
+        ("RPC requests", "rpc_request_seconds", "method"),
+    ):
+        rows = []
+        for labels, count, avg, p50, p99, top in collector.histogram_rows(name):
+            title_labels = [labels.pop(label, "")] + [f"{k}={v}" for k, v in labels.items()]
+            rows.append(f"{' '.join(title_labels):<60} {count:>7} {avg:>8.3f} {p50:>8.3f} {p99:>8.3f} {top:>8.3f}")
+        if rows:
+            sections.append((f"{title:<60} {'count':>7} {'avg,s':>8} {'p50,s':>8} {'p99,s':>8} {'max,s':>8}", rows))
+    rows = []
+    for name in ("rpc_calls_total", "rpc_errors_total", "rpc_retries_total"):
+        for labels, value in collector.counter_rows(name):
+            rows.append(f"{name + ' ' + ' '.join(f'{k}={v}' for k, v in labels.items()):<60} {value:>7}")
+    sent = sum(value for _, value in collector.counter_rows("rpc_bytes_sent_total"))
+    received = sum(value for _, value in collector.counter_rows("rpc_bytes_received_total"))
+    if rows or sent:
+        rows.append(f"{'rpc bytes sent / received':<60} {sent:>7} / {received}")
+        sections.append((f"{'RPC counters':<60} {'value':>7}", rows))
+    return sections
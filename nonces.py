@@ -0,0 +1,120 @@
+import asyncio
+import engine
+import metrics
+import registry
+import signer
+
+# -------------------- Менеджер nonce --------------------
+# Один счётчик на адрес для comfy и hangman. Выдача идёт под asyncio.Lock
+# кошелька, при "nonce too low" счётчик сверяется с тегом pending, а nonce
+# неудачных или выпавших транзакций запоминаются как дыры и закрываются
+# пустой транзакцией на себя перед следующей отправкой.
+NONCE_TOO_LOW = ("nonce too low", "nonce is too low", "oldnonce", "nonce has already been used")
+ALREADY_KNOWN = ("already known", "known transaction", "already imported", "alreadyknown")
+
+
+def _error_text(error):
+    message = getattr(error, "message", None) or str(error)
+    return message.lower().replace("_", " ")
+
+
+def is_nonce_too_low(error):
+    text = _error_text(error)
+    return any(marker in text for marker in NONCE_TOO_LOW)
+
+
+def is_already_known(error):
+    text = _error_text(error)
+    return any(marker in text for marker in ALREADY_KNOWN)
+
+
+class NonceManager:
+    def __init__(self):
+        self._next = {}
+        self._locks = {}
+        self._gaps = {}
+
+    def lock(self, address):
+        lock = self._locks.get(address)
+        if lock is None:
+            lock = self._locks[address] = asyncio.Lock()
+        return lock
+
+    async def _chain_nonce(self, w3, address):
+        return await engine.call(w3.eth.get_transaction_count, address, "pending")
+
+    async def reserve(self, w3, address, count=1):
+        async with self.lock(address):
+            if address not in self._next:
+                self._next[address] = await self._chain_nonce(w3, address)
+            nonce = self._next[address]
+            self._next[address] += count
+            return nonce
+
+    async def prime(self, w3, addresses):
+        # Все nonce на старте запрашиваются одновременно и склеиваются в батчи
+        missing = [a for a in dict.fromkeys(addresses) if a not in self._next]
+        counts = await asyncio.gather(*(self._chain_nonce(w3, a) for a in missing))
+        for address, count in zip(missing, counts):
+            self._next.setdefault(address, count)
+
+    async def resync(self, w3, address):
+        async with self.lock(address):
+            chain = await self._chain_nonce(w3, address)
+            # Нода знает больше нас (транзакции из другого процесса) — догоняем
+            if chain > self._next.get(address, 0):
+                self._next[address] = chain
+            gaps = self._gaps.get(address)
+            if gaps:
+                gaps.difference_update({n for n in gaps if n < chain})
+            return self._next[address]
+
+    def release(self, address, start, count=1):
+        end = start + count
+        if self._next.get(address) == end:
+            # Хвост — просто откатываем счётчик, заодно поглощая дыры прямо под ним
+            gaps = self._gaps.get(address, set())
+            gaps.difference_update(range(start, end))
+            while start - 1 in gaps:
+                start -= 1
+                gaps.discard(start)
+            self._next[address] = start
+        else:
+            self._gaps.setdefault(address, set()).update(range(start, end))
+
+    def gaps(self, address):
+        return sorted(self._gaps.get(address, ()))
+
+    async def fill_gaps(self, w3, wallet, chain_id, fees):
+        record = registry.get(wallet)
+        for nonce in self.gaps(record.address):
+            tx = {
+                "chainId": chain_id,
+                "from": record.address,
+                "to": record.address,
+                "value": 0,
+                "gas": 21000,
+                **fees,
+                "nonce": nonce,
+            }
+            signed_tx = await signer.sign(record.key, tx)
+            try:
+                await engine.call(w3.eth.send_raw_transaction, signed_tx.raw_transaction)
+            except Exception as e:
+                if not (is_nonce_too_low(e) or is_already_known(e)):
+                    return False
+            self._gaps[record.address].discard(nonce)
+        return True
+
+
+manager = NonceManager()
+
+
+async def get_nonce(w3, wallet, count=1):
+    with metrics.stage("nonce"):
+        return await manager.reserve(w3, registry.get(wallet).address, count)
+
+
+def release_nonces(wallet, start, end):
+    if start < end:
+        manager.release(registry.get(wallet).address, start, end - start)
@@ -0,0 +1,74 @@
+import json
+from array import array
+from collections import Counter
+import comfy
+import registry
+
+# -------------------- План выполнения --------------------
+# Перед стартом MODE/ROUNDS_PER_WALLET разворачиваются для всех кошельков
+# в компактную таблицу на массивах: кошелёк, раунд, код операции, сумма и
+# готовый calldata. Горячий цикл только идёт по строкам таблицы.
+OPS = ("mint_usdc", "mint_cusdc", "shield_usdc", "unshield_cusdc", "play_hangman")
+OP_CODES = {name: code for code, name in enumerate(OPS)}
+HANGMAN_OP = OP_CODES["play_hangman"]
+
+
+def op_code(func_name):
+    # play_hangman_single / play_hangman_pipelined — одна операция
+    if func_name.startswith("play_hangman"):
+        return HANGMAN_OP
+    return OP_CODES[func_name]
+
+
+class Plan:
+    __slots__ = ("wallets", "offsets", "wallet", "round", "op", "amount", "calldata")
+
+    def __init__(self):
+        self.wallets = []           # приватные ключи, индекс = номер кошелька в плане
+        self.offsets = array("I", [0])
+        self.wallet = array("I")
+        self.round = array("H")
+        self.op = array("B")
+        self.amount = array("I")    # в целых токенах
+        self.calldata = []          # кортеж bytes на каждую транзакцию операции
+
+    def __len__(self):
+        return len(self.op)
+
+    def add_wallet(self, wallet, rounds):
+        index = len(self.wallets)
+        record = registry.get(wallet)
+        self.wallets.append(wallet)
+        # rounds: (номер раунда, функция, сумма или None — случайная)
+        for round_num, func_name, amount in rounds:
+            code = op_code(func_name)
+            if code == HANGMAN_OP:
+                amount, calldata = 0, ()
+            else:
+                if amount is None:
+                    amount = comfy.random_amount_for_function(OPS[code])
+                calldata = comfy.build_calldata(OPS[code], record.address_hex, amount)
+            self.wallet.append(index)
+            self.round.append(round_num)
+            self.op.append(code)
+            self.amount.append(amount)
+            self.calldata.append(calldata)
+        self.offsets.append(len(self.op))
+        return index
+
+    def rows(self, index):
+        return range(self.offsets[index], self.offsets[index + 1])
+
+    def summary(self):
+        return {OPS[code]: count for code, count in sorted(Counter(self.op).items())}
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            for i in range(len(self)):
+                f.write(json.dumps({
+                    "wallet": registry.get(self.wallets[self.wallet[i]]).address,
+                    "round": self.round[i],
+                    "op": OPS[self.op[i]],
+                    "amount": self.amount[i],
+                    "calldata": ["0x" + data.hex() for data in self.calldata[i]],
+                }) + "\n")
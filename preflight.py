@@ -0,0 +1,144 @@
+import asyncio
+import random
+from eth_abi import decode, encode
+import config
+import engine
+from comfy import APPROVE_PREFIX, USDC_CONTRACT, WRAP_CONTRACT, random_amount_for_function
+
+# -------------------- Предварительная проверка балансов --------------------
+# Перед планированием балансы всех кошельков читаются пачками через
+# Multicall3.aggregate3: USDC, cUSDC (как признак "баланс есть"), ETH
+# и allowance USDC к WRAP_CONTRACT, по PREFLIGHT_CHUNK кошельков на один
+# eth_call. План по этому снимку уменьшает суммы или заменяет операции,
+# которые заведомо откатятся.
+PREFLIGHT = getattr(config, "PREFLIGHT", True)
+PREFLIGHT_CHUNK = getattr(config, "PREFLIGHT_CHUNK", 300)
+MIN_ETH_BALANCE = getattr(config, "MIN_ETH_BALANCE", 0.0002)  # меньше — на газ не хватит
+# balanceOf конфиденциального cUSDC обычно отдаёт зашифрованный handle, а не сумму:
+# по умолчанию он значит только "баланс есть" (не ноль) или "баланса нет" (ноль)
+CUSDC_PLAINTEXT_BALANCE = getattr(config, "CUSDC_PLAINTEXT_BALANCE", False)
+
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3 = bytes.fromhex("82ad56cb")
+BALANCE_OF = bytes.fromhex("70a08231")
+GET_ETH_BALANCE = bytes.fromhex("4d2301cc")
+ALLOWANCE = bytes.fromhex("dd62ed3e")
+SPENDER = APPROVE_PREFIX[4:]  # WRAP_CONTRACT, уже дополненный до 32 байт
+CALLS_PER_WALLET = 4
+TOKEN_UNIT = 10 ** 18
+ETH_UNIT = 10 ** 18
+
+
+class Balances:
+    __slots__ = ("usdc", "cusdc", "eth", "allowance")
+
+    def __init__(self, usdc, cusdc, eth, allowance=None):
+        self.usdc = usdc            # в целых токенах, None = не удалось прочитать
+        self.cusdc = cusdc
+        self.eth = eth              # в wei
+        self.allowance = allowance  # USDC к WRAP_CONTRACT, в wei
+
+    def __repr__(self):
+        return f"Balances(usdc={self.usdc}, cusdc={self.cusdc}, eth={self.eth}, allowance={self.allowance})"
+
+
+def _uint(success, data):
+    return int.from_bytes(data[:32], "big") if success and len(data) >= 32 else None
+
+
+def _calls(address):
+    arg = bytes(12) + bytes.fromhex(address[2:])
+    return [
+        (USDC_CONTRACT, True, BALANCE_OF + arg),
+        (WRAP_CONTRACT, True, BALANCE_OF + arg),
+        (MULTICALL3, True, GET_ETH_BALANCE + arg),
+        (USDC_CONTRACT, True, ALLOWANCE + arg + SPENDER),
+    ]
+
+
+def _cusdc(value):
+    if value is None:
+        return None
+    if CUSDC_PLAINTEXT_BALANCE:
+        return value // TOKEN_UNIT
+    # Нулевой handle — баланс не создан, unshield точно откатится; иначе сумма неизвестна
+    return 0 if value == 0 else None
+
+
+async def _fetch_chunk(w3, addresses):
+    calls = [call for address in addresses for call in _calls(address)]
+    data = AGGREGATE3 + encode(["(address,bool,bytes)[]"], [calls])
+    raw = await engine.call(w3.eth.call, {"to": MULTICALL3, "data": data})
+    (results,) = decode(["(bool,bytes)[]"], bytes(raw))
+    snapshot = {}
+    for i, address in enumerate(addresses):
+        usdc, cusdc, eth, allowance = (
+            _uint(*r) for r in results[CALLS_PER_WALLET * i:CALLS_PER_WALLET * (i + 1)]
+        )
+        snapshot[address] = Balances(
+            usdc // TOKEN_UNIT if usdc is not None else None,
+            _cusdc(cusdc),
+            eth,
+            allowance,
+        )
+    return snapshot
+
+
+async def fetch(w3, addresses, chunk=PREFLIGHT_CHUNK):
+    chunks = [addresses[i:i + chunk] for i in range(0, len(addresses), chunk)]
+    snapshot = {}
+    for part in await asyncio.gather(*(_fetch_chunk(w3, c) for c in chunks)):
+        snapshot.update(part)
+    return snapshot
+
+
+# -------------------- Выбор операций --------------------
+def has_gas(balances):
+    return balances is None or balances.eth is None or balances.eth >= MIN_ETH_BALANCE * ETH_UNIT
+
+
+def fit(func_name, amount, balances):
+    # Сумма, которую операция реально может потратить; None — откатится
+    if balances is None:
+        return amount
+    if func_name == "shield_usdc":
+        have = balances.usdc
+    elif func_name == "unshield_cusdc":
+        have = balances.cusdc
+    else:
+        return amount
+    if have is None:
+        return amount
+    return min(amount, have) if have >= 1 else None
+
+
+def apply(func_name, amount, balances):
+    # Балансы после операции, чтобы следующий раунд видел результат предыдущего
+    if balances is None or amount is None:
+        return
+    if func_name == "mint_usdc" and balances.usdc is not None:
+        balances.usdc += amount
+    elif func_name == "mint_cusdc" and balances.cusdc is not None:
+        balances.cusdc += amount
+    elif func_name == "shield_usdc":
+        if balances.usdc is not None:
+            balances.usdc -= amount
+        if balances.cusdc is not None:
+            balances.cusdc += amount
+    elif func_name == "unshield_cusdc":
+        if balances.cusdc is not None:
+            balances.cusdc -= amount
+        if balances.usdc is not None:
+            balances.usdc += amount
+
+
+def choose(names, balances):
+    # Случайная операция из тех, что пройдут; (имя, сумма)
+    name = random.choice(names)
+    amount = fit(name, random_amount_for_function(name), balances)
+    if amount is None:
+        feasible = [n for n in names if fit(n, 1, balances) is not None]
+        name = random.choice(feasible)
+        amount = fit(name, random_amount_for_function(name), balances)
+    apply(name, amount, balances)
+    return name, amount
@@ -0,0 +1,178 @@
+import asyncio
+import time
+import config
+import engine
+import logs
+import metrics
+
+# -------------------- Трекер квитанций --------------------
+# Вместо отдельного wait_for_transaction_receipt на каждую транзакцию все
+# ожидающие хэши собираются в один реестр. Раз в тик проверяется номер блока,
+# и только на новом блоке квитанции запрашиваются одним JSON-RPC батчем.
+# Количество RPC-запросов растёт с числом блоков, а не с числом транзакций.
+# web3 импортируется только при первой квитанции: plan-only запуск его не грузит.
+RECEIPT_TICK = getattr(config, "RECEIPT_TICK", 1.0)
+RECEIPT_PER_BLOCK = getattr(config, "RECEIPT_PER_BLOCK", True)
+RECEIPT_TIMEOUT = getattr(config, "RECEIPT_TIMEOUT", 180)
+RECEIPT_BATCH_SIZE = getattr(config, "RECEIPT_BATCH_SIZE", 100)
+DROP_AFTER = getattr(config, "DROP_AFTER", 60)
+
+
+class TransactionDropped(Exception):
+    pass
+
+
+class PendingTx:
+    __slots__ = ("tx_hash", "future", "submitted", "deadline", "drop_checked")
+
+    def __init__(self, tx_hash, future, timeout):
+        self.tx_hash = tx_hash
+        self.future = future
+        self.submitted = time.monotonic()
+        self.deadline = self.submitted + timeout
+        self.drop_checked = self.submitted
+
+
+def hash_hex(tx_hash):
+    if isinstance(tx_hash, str):
+        return tx_hash if tx_hash.startswith("0x") else "0x" + tx_hash
+    return "0x" + bytes(tx_hash).hex()
+
+
+def raw_batch(provider):
+    # У провайдеров web3 make_batch_request обёрнут в batching_context, который
+    # ставит _is_batching на весь провайдер: одиночные запросы из других потоков
+    # пула на это время ломаются. Батч квитанций идёт мимо обёртки.
+    method = type(provider).make_batch_request
+    return getattr(method, "__wrapped__", method).__get__(provider)
+
+
+class ReceiptTracker:
+    def __init__(self, w3, tick=RECEIPT_TICK, per_block=RECEIPT_PER_BLOCK):
+        self.w3 = w3
+        self.tick = tick
+        self.per_block = per_block
+        self.pending = {}
+        self.dropped = []
+        self.stats = {"tracked": 0, "receipts": 0, "batches": 0, "block_polls": 0, "timeouts": 0, "dropped": 0, "errors": 0}
+        self._last_block = None
+        self._task = None
+
+    def track(self, tx_hash, timeout=None):
+        key = hash_hex(tx_hash)
+        entry = self.pending.get(key)
+        if entry is None:
+            future = asyncio.get_running_loop().create_future()
+            entry = PendingTx(key, future, timeout or RECEIPT_TIMEOUT)
+            self.pending[key] = entry
+            self.stats["tracked"] += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return entry.future
+
+    def forget(self, tx_hash):
+        # Хэш больше никто не ждёт (например, его заменила транзакция с тем же nonce)
+        entry = self.pending.pop(hash_hex(tx_hash), None)
+        if entry is not None and not entry.future.done():
+            entry.future.cancel()
+
+    async def wait(self, tx_hash, timeout=None):
+        return await asyncio.shield(self.track(tx_hash, timeout))
+
+    async def _run(self):
+        while self.pending:
+            try:
+                if await self._new_block():
+                    await self._poll()
+            except Exception as e:
+                # Сбой батча не должен ронять трекер: повторим на следующем тике
+                self.stats["errors"] += 1
+                metrics.inc("receipt_poll_errors_total", reason=type(e).__name__)
+                logs.log(f"⚠️ Receipt poll failed: {e}", color="yellow", sample="receipt_poll")
+            self._expire()
+            if self.pending:
+                await asyncio.sleep(self.tick)
+
+    async def _new_block(self):
+        if not self.per_block:
+            return True
+        block = await engine.call(lambda: self.w3.eth.block_number)
+        self.stats["block_polls"] += 1
+        if block == self._last_block:
+            return False
+        self._last_block = block
+        return True
+
+    async def _batch(self, method, hashes):
+        results = {}
+        for i in range(0, len(hashes), RECEIPT_BATCH_SIZE):
+            chunk = hashes[i:i + RECEIPT_BATCH_SIZE]
+            responses = await engine.call(
+                raw_batch(self.w3.provider), [(method, [h]) for h in chunk]
+            )
+            self.stats["batches"] += 1
+            if not isinstance(responses, list):
+                raise Exception(f"Batch {method} failed: {responses.get('error')}")
+            for h, response in zip(chunk, responses):
+                results[h] = response.get("result")
+        return results
+
+    async def _poll(self):
+        from web3.datastructures import AttributeDict
+        from web3._utils.method_formatters import receipt_formatter
+
+        hashes = list(self.pending)
+        receipts = await self._batch("eth_getTransactionReceipt", hashes)
+        for h, raw in receipts.items():
+            if raw is None:
+                continue
+            entry = self.pending.pop(h, None)
+            if entry and not entry.future.done():
+                entry.future.set_result(AttributeDict.recursive(receipt_formatter(raw)))
+                self.stats["receipts"] += 1
+
+        # Давно висящие без квитанции: проверяем, знает ли нода о транзакции вообще
+        now = time.monotonic()
+        stale = [h for h, e in self.pending.items() if now - e.drop_checked >= DROP_AFTER]
+        if stale:
+            known = await self._batch("eth_getTransactionByHash", stale)
+            for h, tx in known.items():
+                entry = self.pending.get(h)
+                if entry is None:
+                    continue
+                entry.drop_checked = now
+                if tx is None:
+                    self.pending.pop(h)
+                    self.dropped.append(h)
+                    self.stats["dropped"] += 1
+                    if not entry.future.done():
+                        entry.future.set_exception(TransactionDropped(f"Transaction {h} dropped from mempool"))
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [h for h, e in self.pending.items() if now >= e.deadline]
+        if expired:
+            from web3.exceptions import TimeExhausted
+        for h in expired:
+            entry = self.pending.pop(h)
+            self.stats["timeouts"] += 1
+            if not entry.future.done():
+                entry.future.set_exception(TimeExhausted(
+                    f"Transaction {h} is not in the chain after {entry.deadline - entry.submitted:.0f} seconds"
+                ))
+
+
+# -------------------- Общий трекер --------------------
+_trackers = {}
+
+
+def get_tracker(w3):
+    loop = asyncio.get_running_loop()
+    tracker = _trackers.get((w3, loop))
+    if tracker is None:
+        tracker = _trackers[(w3, loop)] = ReceiptTracker(w3)
+    return tracker
+
+
+async def wait_for_receipt(w3, tx_hash, timeout=None):
+    return await get_tracker(w3).wait(tx_hash, timeout)
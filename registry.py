@@ -0,0 +1,55 @@
+import random
+from eth_account import Account
+from config import TX_DELAY
+
+# -------------------- Реестр кошельков --------------------
+# Ключ разворачивается в аккаунт один раз: secp256k1 и keccak-чексумма
+# больше не считаются на каждой транзакции и каждой строке лога.
+# Коды colorama Fore.RED, GREEN, YELLOW, CYAN, MAGENTA — без импорта colorama
+COLOR_LIST = ["\033[31m", "\033[32m", "\033[33m", "\033[36m", "\033[35m"]
+DEFAULT_COLOR = "\033[36m"
+
+
+class Wallet:
+    __slots__ = ("key", "account", "address", "address_hex", "color", "delay", "tx_delay")
+
+    def __init__(self, key, color, delay):
+        self.key = key
+        self.account = Account.from_key(key)
+        self.address = self.account.address            # checksum
+        self.address_hex = self.address.lower()[2:]    # для calldata
+        self.color = color
+        self.delay = delay                             # пауза между функциями
+        self.tx_delay = None                           # пауза между транзакциями (comfy)
+
+    def __repr__(self):
+        return f"Wallet({self.address})"
+
+
+_by_key = {}
+_by_address = {}
+
+
+def _create(key):
+    color = COLOR_LIST[len(_by_key) % len(COLOR_LIST)]
+    record = Wallet(key, color, random.uniform(TX_DELAY[0], TX_DELAY[1]))
+    _by_key[key] = record
+    _by_address[record.address] = record
+    return record
+
+
+def register(keys):
+    return [_by_key.get(key) or _create(key) for key in keys]
+
+
+def get(key):
+    return _by_key.get(key) or _create(key)
+
+
+def by_address(address):
+    return _by_address.get(address)
+
+
+def color_for(address, default=DEFAULT_COLOR):
+    record = _by_address.get(address)
+    return record.color if record else default
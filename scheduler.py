@@ -0,0 +1,144 @@
+import asyncio
+import heapq
+import itertools
+from collections import deque
+from contextvars import ContextVar
+import config
+
+# -------------------- Планировщик --------------------
+# Вместо корутины на каждый кошелёк, которая почти всё время спит в
+# asyncio.sleep, у планировщика одна куча таймеров: (срок, seq, индекс
+# кошелька). Когда срок подошёл, шаг кошелька запускается в одном из
+# SCHEDULER_CONCURRENCY слотов, не чаще SCHEDULER_RATE шагов в секунду.
+# Шаг возвращает паузу до следующего шага или None, если кошелёк закончил.
+# Ждущий кошелёк — это одна запись в куче, без задачи и таймера.
+SCHEDULER_CONCURRENCY = getattr(config, "SCHEDULER_CONCURRENCY", 256)
+SCHEDULER_RATE = getattr(config, "SCHEDULER_RATE", 0)  # шагов в секунду, 0 = без ограничения
+
+_current = ContextVar("scheduler", default=None)
+
+
+class Scheduler:
+    def __init__(self, step, concurrency=SCHEDULER_CONCURRENCY, rate=SCHEDULER_RATE):
+        self.step = step
+        self.concurrency = max(1, int(concurrency))
+        self.interval = 1.0 / rate if rate else 0.0
+        self._timers = []       # куча (срок, seq, индекс кошелька или future паузы)
+        self._ready = deque()   # срок подошёл, ждут свободного слота
+        self._seq = itertools.count()
+        self._tasks = set()
+        self._slots = None
+        self._wakeup = None
+        self._next_start = 0.0
+        self.running = 0
+        self.steps = 0
+        self.sleeps = 0
+        self.errors = 0
+        self.peak = 0
+        self.max_lag = 0.0
+
+    def _push(self, due, item):
+        heapq.heappush(self._timers, (due, next(self._seq), item))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def at(self, due, index):
+        self._push(due, index)
+
+    def after(self, delay, index):
+        self._push(asyncio.get_running_loop().time() + max(0.0, delay), index)
+
+    async def sleep(self, delay):
+        # Пауза внутри шага (approve → wrap, между буквами) освобождает слот
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.sleeps += 1
+        self._release()
+        self._push(loop.time() + max(0.0, delay), future)
+        try:
+            await future
+        finally:
+            await self._slots.acquire()
+            self._occupy()
+
+    def _occupy(self):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+
+    def _release(self):
+        self.running -= 1
+        self._slots.release()
+        self._wakeup.set()
+
+    async def _run(self, index):
+        _current.set(self)
+        delay = None
+        try:
+            delay = await self.step(index)
+        except Exception:
+            self.errors += 1
+        finally:
+            self._release()
+            self._tasks.discard(asyncio.current_task())
+        if delay is not None:
+            self.after(delay, index)
+
+    def _start(self, now):
+        due, index = self._ready.popleft()
+        self.max_lag = max(self.max_lag, now - due)
+        self._next_start = max(now, self._next_start) + self.interval
+        self.steps += 1
+        self._occupy()
+        self._tasks.add(asyncio.create_task(self._run(index)))
+
+    async def run(self, indexes):
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._wakeup = asyncio.Event()
+        now = loop.time()
+        for index in indexes:
+            self.at(now, index)
+
+        while self._timers or self._ready or self._tasks:
+            self._wakeup.clear()
+            now = loop.time()
+            while self._timers and self._timers[0][0] <= now:
+                due, _, item = heapq.heappop(self._timers)
+                if isinstance(item, asyncio.Future):
+                    if not item.done():
+                        item.set_result(None)
+                else:
+                    self._ready.append((due, item))
+            # Проснувшиеся паузы стоят в очереди семафора раньше новых шагов
+            while self._ready and not self._slots.locked() and now >= self._next_start:
+                await self._slots.acquire()
+                self._start(now)
+
+            timeout = None
+            if self._timers:
+                timeout = self._timers[0][0] - now
+            if self._ready and not self._slots.locked():
+                wait = self._next_start - now
+                timeout = wait if timeout is None else min(timeout, wait)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self):
+        return {
+            "steps": self.steps,
+            "sleeps": self.sleeps,
+            "errors": self.errors,
+            "peak": self.peak,
+            "max_lag": self.max_lag,
+        }
+
+
+async def sleep(delay):
+    # Внутри шага планировщика — пауза через общую кучу, иначе обычный sleep
+    current = _current.get()
+    if current is None:
+        await asyncio.sleep(delay)
+    else:
+        await current.sleep(delay)
@@ -0,0 +1,164 @@
+import asyncio
+import config
+import engine
+import gas
+import journal
+import logs
+import metrics
+import nonces
+import receipts
+import registry
+import signer
+
+# -------------------- Отправка транзакции --------------------
+# Общий путь sign + broadcast для comfy и hangman: перед отправкой
+# закрываются дыры в nonce, "nonce too low" лечится пересинхронизацией,
+# "already known" считается успешной отправкой.
+STUCK_AFTER = getattr(config, "STUCK_AFTER", 45)
+REPLACE_MAX = getattr(config, "REPLACE_MAX", 3)
+FEE_BUMP = getattr(config, "FEE_BUMP", 1.125)          # ноды требуют не меньше +10% на замену
+REPLACE_FEE_CAP = getattr(config, "REPLACE_FEE_CAP", 3.0)  # максимум относительно исходной цены
+
+async def broadcast(w3, wallet, tx, signed=None):
+    record = registry.get(wallet)
+    if nonces.manager.gaps(record.address):
+        try:
+            filled = await nonces.manager.fill_gaps(w3, wallet, tx["chainId"], await gas.fees(w3))
+        except Exception:
+            nonces.manager.release(record.address, tx["nonce"])
+            raise
+        if not filled:
+            # Над незакрытой дырой транзакция только провисит до таймаута
+            metrics.inc("tx_send_errors_total", reason="gap_not_filled")
+            nonces.manager.release(record.address, tx["nonce"])
+            raise Exception(f"[{record.address}] nonce gap {nonces.manager.gaps(record.address)} not filled, tx not sent")
+
+    for attempt in range(3):
+        # Заранее подписанную транзакцию используем только с исходным nonce
+        try:
+            signed_tx = signed if signed is not None and attempt == 0 else await signer.sign(record.key, tx)
+        except Exception:
+            # Например, BrokenProcessPool: до отправки не дошло, nonce возвращаем
+            metrics.inc("tx_send_errors_total", reason="sign")
+            nonces.manager.release(record.address, tx["nonce"])
+            raise
+        try:
+            with metrics.stage("send_raw_transaction"):
+                tx_hash = await engine.call(w3.eth.send_raw_transaction, signed_tx.raw_transaction)
+        except Exception as e:
+            if nonces.is_already_known(e):
+                metrics.inc("tx_send_errors_total", reason="already_known")
+                tx_hash = signed_tx.hash
+            elif nonces.is_nonce_too_low(e):
+                metrics.inc("tx_send_errors_total", reason="nonce_too_low")
+                if attempt == 2:
+                    raise
+                await nonces.manager.resync(w3, record.address)
+                tx["nonce"] = await nonces.manager.reserve(w3, record.address)
+                continue
+            else:
+                metrics.inc("tx_send_errors_total", reason="other")
+                nonces.manager.release(record.address, tx["nonce"])
+                raise
+        journal.tx_sent(record.address, tx["nonce"], receipts.hash_hex(tx_hash), gas.selector(tx.get("data", b"")))
+        return tx_hash
+
+
+# -------------------- Сторож зависших транзакций --------------------
+# Если квитанции нет дольше STUCK_AFTER секунд, транзакция с тем же nonce
+# переподписывается с комиссией +FEE_BUMP (и не ниже текущей цены оракула)
+# и отправляется снова — не больше REPLACE_MAX раз и не дороже REPLACE_FEE_CAP
+# от исходной цены. Трекер ждёт все хэши с этим nonce; какой из них попал
+# в блок, тот и считается транзакцией, остальные помечаются replaced.
+FEE_FIELDS = ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+
+def bump_fees(tx, fees, original):
+    bumped = {}
+    for field in FEE_FIELDS:
+        if field in tx:
+            value = max(int(tx[field] * FEE_BUMP) + 1, fees.get(field, 0))
+            if value > original[field] * REPLACE_FEE_CAP:
+                return None
+            bumped[field] = value
+    if "maxFeePerGas" in bumped:
+        bumped["maxFeePerGas"] = max(bumped["maxFeePerGas"], bumped["maxPriorityFeePerGas"])
+    return bumped
+
+
+async def replace(w3, record, tx, original):
+    bumped = bump_fees(tx, await gas.fees(w3), original)
+    if bumped is None:
+        logs.log(f"[{record.address}] nonce {tx['nonce']} stuck, fee cap reached", wallet=record.address)
+        return None
+    previous = {field: tx[field] for field in bumped}
+    tx.update(bumped)
+    signed_tx = await signer.sign(record.key, tx)
+    try:
+        with metrics.stage("send_raw_transaction"):
+            tx_hash = await engine.call(w3.eth.send_raw_transaction, signed_tx.raw_transaction)
+    except Exception as e:
+        if nonces.is_already_known(e):
+            tx_hash = signed_tx.hash
+        else:
+            # nonce too low — одна из прежних уже в блоке; иначе замену не приняли
+            tx.update(previous)
+            metrics.inc("tx_replace_errors_total")
+            return None
+    metrics.inc("tx_replaced_total")
+    journal.tx_sent(record.address, tx["nonce"], receipts.hash_hex(tx_hash), gas.selector(tx.get("data", b"")))
+    logs.log(
+        f"[{record.address}] nonce {tx['nonce']} stuck for {STUCK_AFTER}s, replaced with "
+        f"{', '.join(f'{k}={v}' for k, v in bumped.items())} | {receipts.hash_hex(tx_hash)}",
+        wallet=record.address, color="yellow"
+    )
+    return tx_hash
+
+
+async def watch(w3, record, tx, tx_hash):
+    tracker = receipts.get_tracker(w3)
+    waiting = {tracker.track(tx_hash): receipts.hash_hex(tx_hash)}
+    original = {field: tx[field] for field in FEE_FIELDS if field in tx}
+    replacements = 0
+    error = None
+    while waiting:
+        can_replace = replacements < REPLACE_MAX
+        done, _ = await asyncio.wait(
+            waiting, timeout=STUCK_AFTER if can_replace else None, return_when=asyncio.FIRST_COMPLETED
+        )
+        if not done:
+            replacements += 1
+            new_hash = await replace(w3, record, tx, original)
+            if new_hash is None:
+                replacements = REPLACE_MAX
+            else:
+                waiting[tracker.track(new_hash)] = receipts.hash_hex(new_hash)
+            continue
+        # Сначала успешные: квитанция важнее ошибки соседнего хэша
+        for future in sorted(done, key=lambda f: f.exception() is not None):
+            mined_hash = waiting.pop(future)
+            if future.exception() is None:
+                for other in waiting.values():
+                    tracker.forget(other)
+                    journal.tx_status(other, "replaced")
+                return future.result(), mined_hash
+            # Выпавший из mempool старый хэш при живой замене — это норма
+            error = future.exception()
+            if isinstance(error, receipts.TransactionDropped):
+                journal.tx_status(mined_hash, "dropped")
+    raise error
+
+
+async def confirm(w3, wallet, tx, tx_hash):
+    record = registry.get(wallet)
+    try:
+        with metrics.stage("receipt"):
+            receipt, mined_hash = await watch(w3, record, tx, tx_hash)
+    except receipts.TransactionDropped:
+        metrics.inc("tx_dropped_total")
+        nonces.manager.release(record.address, tx["nonce"])
+        raise
+    status = "mined" if receipt["status"] == 1 else "reverted"
+    metrics.inc("tx_total", status=status)
+    journal.tx_status(mined_hash, status)
+    return receipt
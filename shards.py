@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import shuffle_wallets, JOURNAL_FILE
+from metrics import METRICS_FILE
+from logs import LOG_FILE
+import logs
+import main
+
+# -------------------- Настройки --------------------
+# Один запуск на весь парк: группы из wallets.txt (или куски одной большой
+# группы) раскладываются по пулу процессов, каждому шарду — свой прокси
+# из proxies.txt по кругу. Прогресс и итоги собираются в родительском процессе.
+SHARD_GROUPS = None  # None = все группы, иначе список индексов, например [0, 2]
+SHARD_SIZE = 0       # >0 — резать группы на шарды по SHARD_SIZE кошельков
+WORKERS = os.cpu_count() or 1
+
+
+def shard_file(path, group, part, default_ext):
+    if not path:
+        return None
+    base, ext = os.path.splitext(path)
+    return f"{base}_g{group}_p{part}{ext or default_ext}"
+
+
+def shard_journal(group, part):
+    return shard_file(JOURNAL_FILE, group, part, ".db")
+
+
+def plan_shards(groups, proxies, group_indexes=None, shard_size=SHARD_SIZE):
+    # Порядок кошельков внутри шарда фиксирован, чтобы журнал шарда
+    # совпадал между перезапусками; перемешивание — уже внутри процесса
+    shards = []
+    for group in (group_indexes if group_indexes is not None else range(len(groups))):
+        wallets = groups[group]
+        if shard_size > 0:
+            chunks = [wallets[i:i + shard_size] for i in range(0, len(wallets), shard_size)]
+        else:
+            chunks = [wallets]
+        for part, chunk in enumerate(chunks):
+            if chunk:
+                shards.append({"id": len(shards), "group": group, "part": part, "wallets": chunk})
+    for shard in shards:
+        shard["proxy"] = proxies[shard["id"] % len(proxies)] if proxies else None
+        shard["journal"] = shard_journal(shard["group"], shard["part"])
+        shard["metrics"] = shard_file(METRICS_FILE, shard["group"], shard["part"], ".prom")
+        shard["log"] = shard_file(LOG_FILE, shard["group"], shard["part"], ".log")
+    return shards
+
+
+# -------------------- Шард-процесс --------------------
+def run_shard(shard, queue):
+    def report(address, round_num, func_name, ok):
+        queue.put((shard["id"], address, round_num, func_name, ok))
+
+    main.progress_hook = report
+    # У каждого шарда свой файл лога: ротация из нескольких процессов в один файл небезопасна
+    logs.setup(shard["log"])
+    wallets = list(shard["wallets"])
+    if shuffle_wallets:
+        random.shuffle(wallets)
+    try:
+        summary = asyncio.run(main.run_group(wallets, shard["group"], shard["proxy"], shard["journal"], shard["metrics"]))
+    except Exception as e:
+        summary = {"group": shard["group"], "proxy": shard["proxy"], "wallets": len(wallets), "error": str(e)}
+    finally:
+        logs.stop()
+    summary["shard"] = shard["id"]
+    summary["part"] = shard["part"]
+    return summary
+
+
+# -------------------- Прогресс --------------------
+def watch_progress(queue, total_rounds):
+    done = failed = 0
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        shard_id, address, round_num, func_name, ok = item
+        done += ok
+        failed += not ok
+        main.print_colored(
+            f"📊 [{done + failed}/{total_rounds}] shard #{shard_id} {address} round {round_num} "
+            f"{func_name}: {'ok' if ok else 'failed'} | total ok {done}, failed {failed}",
+            "cyan" if ok else "red"
+        )
+
+
+def print_summary(results, elapsed):
+    main.print_colored(f"\n{'shard':>5} {'group':>5} {'part':>4} {'wallets':>7} {'done':>6} {'failed':>6} {'time,s':>8}  proxy", "magenta")
+    for r in sorted(results, key=lambda r: r["shard"]):
+        if "error" in r:
+            main.print_colored(f"{r['shard']:>5} {r['group']:>5} {r['part']:>4} {r['wallets']:>7}  ❌ {r['error']}", "red")
+            continue
+        main.print_colored(
+            f"{r['shard']:>5} {r['group']:>5} {r['part']:>4} {r['wallets']:>7} {r['rounds_done']:>6} "
+            f"{r['rounds_failed']:>6} {r['elapsed']:>8.1f}  {r['proxy'] or '-'}",
+            "cyan"
+        )
+    done = sum(r.get("rounds_done", 0) for r in results)
+    failed = sum(r.get("rounds_failed", 0) for r in results)
+    main.print_colored(f"🎉 {len(results)} shards finished in {elapsed:.1f}s | rounds ok {done}, failed {failed}", "green")
+
+
+def print_plan(shards):
+    # --dry-run: раскладка по шардам без запуска процессов и сети
+    main.print_colored(f"{'shard':>5} {'group':>5} {'part':>4} {'wallets':>7}  proxy / journal", "magenta")
+    for s in shards:
+        main.print_colored(
+            f"{s['id']:>5} {s['group']:>5} {s['part']:>4} {len(s['wallets']):>7}  {s['proxy'] or '-'} / {s['journal'] or '-'}",
+            "cyan"
+        )
+
+
+def run_fleet(group_indexes=SHARD_GROUPS, shard_size=SHARD_SIZE, workers=WORKERS, dry_run=False):
+    groups = main.load_groups("wallets.txt")
+    shards = plan_shards(groups, main.load_proxies(), group_indexes, shard_size)
+    if dry_run:
+        print_plan(shards)
+        return []
+    total_rounds = sum(len(s["wallets"]) for s in shards) * main.ROUNDS_PER_WALLET
+    main.print_colored(
+        f"🚀 Mode {main.MODE} | {len(shards)} shards | {sum(len(s['wallets']) for s in shards)} wallets | {workers} processes",
+        "cyan"
+    )
+
+    started = time.perf_counter()
+    with multiprocessing.Manager() as manager:
+        queue = manager.Queue()
+        watcher = threading.Thread(target=watch_progress, args=(queue, total_rounds), daemon=True)
+        watcher.start()
+        results = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)) or 1) as pool:
+            futures = [pool.submit(run_shard, shard, queue) for shard in shards]
+            for future in as_completed(futures):
+                results.append(future.result())
+        queue.put(None)
+        watcher.join()
+    print_summary(results, time.perf_counter() - started)
+    return results
+
+
+# -------------------- Запуск --------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run wallet groups across a process pool")
+    parser.add_argument("--groups", help="comma-separated group indexes (default: all)")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="split groups into shards of N wallets")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="number of worker processes")
+    parser.add_argument("--dry-run", action="store_true", help="print the shard layout without starting anything")
+    args = parser.parse_args()
+
+    indexes = [int(g) for g in args.groups.split(",")] if args.groups else SHARD_GROUPS
+    run_fleet(indexes, args.shard_size, args.workers, args.dry_run)
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from eth_account import Account
+import config
+import metrics
+
+# -------------------- Пул подписи --------------------
+# ECDSA-подпись и RLP-кодирование — чистый CPU. Вместо подписи прямо на
+# event loop транзакции подписываются в пуле процессов (или потоков),
+# а транзакции одного раунда можно подписать одной пачкой заранее.
+SIGNER_MODE = getattr(config, "SIGNER_MODE", "process")  # process, thread, inline
+SIGNER_WORKERS = getattr(config, "SIGNER_WORKERS", 2)
+
+Signed = namedtuple("Signed", ["raw_transaction", "hash"])
+
+
+def _sign(key, tx):
+    signed = Account.sign_transaction(tx, key)
+    return Signed(bytes(signed.raw_transaction), bytes(signed.hash))
+
+
+def _sign_batch(key, txs):
+    return [_sign(key, tx) for tx in txs]
+
+
+class Signer:
+    def __init__(self, mode=SIGNER_MODE, workers=SIGNER_WORKERS):
+        self.mode = mode
+        self.workers = workers
+        self.signed = 0
+        self.batches = 0
+        self.busy = 0.0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="signer")
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self.mode == "inline":
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def sign(self, key, tx):
+        start = time.perf_counter()
+        signed = await self._run(_sign, key, dict(tx))
+        elapsed = time.perf_counter() - start
+        self.busy += elapsed
+        metrics.observe("tx_stage_seconds", elapsed, stage="sign")
+        self.signed += 1
+        return signed
+
+    async def sign_batch(self, key, txs):
+        start = time.perf_counter()
+        signed = await self._run(_sign_batch, key, [dict(tx) for tx in txs])
+        elapsed = time.perf_counter() - start
+        self.busy += elapsed
+        metrics.observe("tx_stage_seconds", elapsed, stage="sign_batch")
+        self.signed += len(txs)
+        self.batches += 1
+        return signed
+
+    def stats(self):
+        return {
+            "signed": self.signed,
+            "batches": self.batches,
+            "seconds": self.busy,
+            "avg_ms": 1000 * self.busy / self.signed if self.signed else 0.0,
+            "per_second": self.signed / self.busy if self.busy else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+signer = Signer()
+
+
+async def sign(key, tx):
+    return await signer.sign(key, tx)
+
+
+async def sign_batch(key, txs):
+    return await signer.sign_batch(key, txs)
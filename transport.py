@@ -0,0 +1,200 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.providers import JSONBaseProvider
+from web3._utils.batching import sort_batch_response_by_response_ids
+import config
+import logs
+import metrics
+from batching import CoalescingProvider, BATCH_WINDOW
+
+# -------------------- Транспорт RPC --------------------
+# Общий для всех модулей пул keep-alive соединений на пару (endpoint, proxy).
+# Запросы распределяются по RPC_URLS с весом по наблюдаемой задержке,
+# при ошибке или 429 уходят на следующий endpoint, а endpoint с серией
+# ошибок выключается circuit breaker'ом на CIRCUIT_COOLDOWN секунд.
+RPC_URLS = getattr(config, "RPC_URLS", None) or [config.RPC_URL]
+RPC_TIMEOUT = getattr(config, "RPC_TIMEOUT", 30)
+POOL_SIZE = getattr(config, "POOL_SIZE", 64)
+CIRCUIT_THRESHOLD = getattr(config, "CIRCUIT_THRESHOLD", 3)
+CIRCUIT_COOLDOWN = getattr(config, "CIRCUIT_COOLDOWN", 30)
+LATENCY_ALPHA = 0.2
+INITIAL_LATENCY = 0.5
+RATE_LIMIT_CODES = (-32005, 429)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url, proxy=None):
+    with _sessions_lock:
+        session = _sessions.get((url, proxy))
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            if proxy:
+                session.proxies = {"http": proxy, "https": proxy}
+            _sessions[(url, proxy)] = session
+        return session
+
+
+class RateLimited(Exception):
+    pass
+
+
+def url_label(url):
+    # Для меток метрик: без user:pass, пути и query — там бывают пароли прокси и API-ключи
+    if not url:
+        return "-"
+    parts = urlsplit(url if "://" in url else "http://" + url)
+    host = parts.hostname or "?"
+    return f"{parts.scheme}://{host}:{parts.port}" if parts.port else f"{parts.scheme}://{host}"
+
+
+class Endpoint:
+    __slots__ = ("url", "label", "session", "latency", "failures", "open_until", "requests", "errors")
+
+    def __init__(self, url, session, label=None):
+        self.url = url
+        self.label = label or url_label(url)
+        self.session = session
+        self.latency = INITIAL_LATENCY
+        self.failures = 0
+        self.open_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def available(self, now):
+        return now >= self.open_until
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    def __init__(self, urls=None, proxy=None, timeout=RPC_TIMEOUT, **kwargs):
+        super().__init__(**kwargs)
+        self.proxy = proxy
+        self.proxy_label = url_label(proxy)
+        self.timeout = timeout
+        urls = urls or RPC_URLS
+        labels = [url_label(url) for url in urls]
+        # Один хост с разными ключами в пути различаем по номеру
+        labels = [f"{label}#{i}" if labels.count(label) > 1 else label for i, label in enumerate(labels)]
+        self.endpoints = [Endpoint(url, get_session(url, proxy), label) for url, label in zip(urls, labels)]
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f"Pooled RPC connection {[e.url for e in self.endpoints]}"
+
+    def _pick(self, tried):
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in tried and e.available(now)]
+            if not candidates:
+                # Все выключены — берём тот, что раньше всех вернётся
+                candidates = sorted((e for e in self.endpoints if e not in tried), key=lambda e: e.open_until)[:1]
+            if not candidates:
+                return None
+            weights = [1.0 / max(e.latency, 0.001) for e in candidates]
+            return random.choices(candidates, weights)[0]
+
+    def _success(self, endpoint, elapsed):
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.latency += LATENCY_ALPHA * (elapsed - endpoint.latency)
+            endpoint.failures = 0
+            endpoint.open_until = 0.0
+
+    def _failure(self, endpoint):
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.failures >= CIRCUIT_THRESHOLD:
+                endpoint.open_until = time.monotonic() + CIRCUIT_COOLDOWN
+
+    def _post(self, request_data, check=None, method="batch"):
+        tried = []
+        last_error = None
+        proxy = self.proxy_label
+        while True:
+            endpoint = self._pick(tried)
+            if endpoint is None:
+                raise last_error
+            if tried:
+                metrics.inc("rpc_retries_total", method=method, endpoint=endpoint.label, proxy=proxy)
+            tried.append(endpoint)
+            start = time.perf_counter()
+            try:
+                response = endpoint.session.post(
+                    endpoint.url,
+                    data=request_data,
+                    headers={"Content-Type": "application/json"},
+                    timeout=self.timeout,
+                )
+                if response.status_code == 429:
+                    raise RateLimited(f"{endpoint.label} returned 429")
+                response.raise_for_status()
+                decoded = self.decode_rpc_response(response.content)
+                if check:
+                    check(decoded)
+            except (requests.RequestException, RateLimited) as e:
+                self._failure(endpoint)
+                metrics.inc("rpc_errors_total", method=method, endpoint=endpoint.label, reason=type(e).__name__)
+                last_error = e
+                continue
+            elapsed = time.perf_counter() - start
+            self._success(endpoint, elapsed)
+            metrics.observe("rpc_request_seconds", elapsed, method=method, endpoint=endpoint.label, proxy=proxy)
+            metrics.inc("rpc_bytes_sent_total", len(request_data), endpoint=endpoint.label)
+            metrics.inc("rpc_bytes_received_total", len(response.content), endpoint=endpoint.label)
+            if isinstance(decoded, dict) and "error" in decoded:
+                metrics.inc("rpc_errors_total", method=method, endpoint=endpoint.label, reason="rpc_error")
+            return decoded
+
+    @staticmethod
+    def _check_rate_limit(response):
+        error = response.get("error") if isinstance(response, dict) else None
+        if error and error.get("code") in RATE_LIMIT_CODES:
+            raise RateLimited(error.get("message", "rate limited"))
+
+    def make_request(self, method, params):
+        metrics.inc("rpc_calls_total", method=method)
+        request_data = self.encode_rpc_request(method, params)
+        return self._post(request_data, self._check_rate_limit, method)
+
+    def make_batch_request(self, batch_requests):
+        # Без batching_context: флаг _is_batching общий на провайдер и ломал бы
+        # одиночные запросы из других потоков пула, пока батч в полёте
+        for method, _ in batch_requests:
+            metrics.inc("rpc_calls_total", method=method)
+        request_data = self.encode_batch_rpc_request(batch_requests)
+        response = self._post(request_data, self._check_rate_limit)
+        if not isinstance(response, list):
+            return response
+        # Как в HTTPProvider: по id, а ответы без id — в порядке прихода
+        return sort_batch_response_by_response_ids(response)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {"url": e.url, "latency": e.latency, "requests": e.requests, "errors": e.errors,
+                 "open": not e.available(time.monotonic())}
+                for e in self.endpoints
+            ]
+
+
+# -------------------- Подключение --------------------
+def connect_to_rpc_with_proxy(proxy=None):
+    provider = PooledHTTPProvider(RPC_URLS, proxy)
+    if BATCH_WINDOW:
+        provider = CoalescingProvider(provider)
+    w3 = Web3(provider)
+    if not w3.is_connected():
+        raise Exception(f"❌ Could not connect to RPC: {', '.join(RPC_URLS)}")
+    logs.log(f"✅ Connected to RPC: {', '.join(RPC_URLS)}", color="magenta")
+    return w3